@@ -12,7 +12,6 @@ import fcntl
 import math
 import io
 import os
-import av
 import re
 
 router = APIRouter()
@@ -35,6 +34,7 @@ async def extract_audio(request: Request):
         #     if 'photoId' in key:
         #         print(val)
         return
+    import av  # PyAV 加载很慢，用到时再导入
     # 创建流容器
     container = av.open(url)
 
@@ -78,6 +78,7 @@ async def read_ff_info(request: Request):
     # if url:
     #     response = session.get(url, headers={"User-Agent": "AptvPlayer/1.2.3"})
     #     data = io.BytesIO(response.content)
+    import av
     try:
         container = av.open(byte_data)
     except Exception as e:
@@ -0,0 +1,65 @@
+from fastapi import APIRouter
+from core.req import http_client
+from core.trace import tracer
+from core.middleware import latency_stats
+from core.log import log_stats
+from core.startup import report
+from databases.kv import kv
+from services.feeds import feeds
+from bot.tgb import update_queue, dispatcher, sender
+
+router = APIRouter()
+
+@router.get("/http")
+async def http_stats():
+    """出站 HTTP 各阶段耗时直方图（按 host），以及限流排队和熔断状态"""
+    return {
+        "phases": tracer.snapshot(),
+        "limits": http_client.queue_depth(),
+        "breakers": {
+            host: {"state": breaker.state, "failures": breaker.failures, "retry_in": round(breaker.retry_in, 1)}
+            for host, breaker in http_client.breakers.items()
+        },
+    }
+
+@router.post("/http/reset")
+async def http_stats_reset():
+    tracer.reset()
+    return 'ok'
+
+@router.get("/latency")
+async def latency():
+    """各路由最近请求的 p50/p95/p99 耗时（毫秒）"""
+    return latency_stats.snapshot()
+
+@router.get("/logging")
+async def logging_stats():
+    """日志队列积压和因队列满被丢弃的条数"""
+    return log_stats()
+
+@router.get("/kv-cache")
+async def kv_cache_stats():
+    """KV 本地读缓存命中情况，active 为 false 时说明 keyspace 订阅不可用，缓存未启用"""
+    return {"active": kv.notifier.active, **kv.local.stats(), "watch": kv.watcher.stats()}
+
+@router.get("/feeds")
+async def feeds_stats():
+    """后台预取的快照年龄（秒）和最近一次失败原因"""
+    return feeds.stats()
+
+@router.get("/webhook")
+async def webhook_stats():
+    """webhook 队列积压和去重/拒绝计数，以及按会话分发的排队情况"""
+    if not update_queue:
+        return {"enabled": False}
+    return {**update_queue.stats(), "dispatcher": dispatcher.stats()}
+
+@router.get("/sender")
+async def sender_stats():
+    """出站消息调度：排队、延后重试、429 暂停剩余秒数和进行中的批量任务"""
+    return sender.stats() if sender else {"enabled": False}
+
+@router.get("/startup")
+async def startup_report():
+    """启动时各路由 / handler 模块的导入耗时（毫秒）"""
+    return report(top=0)
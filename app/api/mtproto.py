@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request
 from services.telegram import telegram
-import asyncio
+from core.req import iter_completed
 
 router = APIRouter()
 
@@ -14,7 +14,9 @@ async def get_tg_messages(request: Request):
         return {"error": "channel is required"}
     
     channels = channel.split(',')
-    tasks = [telegram.search_messages(ch, keyword, count) for ch in channels]
-    results = await asyncio.gather(*tasks)
-    messages = {channels[i]: results[i] for i in range(len(channels))}
+    results = {}
+    # 单个频道失败不影响其他频道
+    async for result in iter_completed(channels, lambda ch: telegram.search_messages(ch, keyword, count), concurrency=5):
+        results[result.item] = result.result if result.ok else {"error": str(result.error)}
+    messages = {ch: results[ch] for ch in channels}
     return messages
\ No newline at end of file
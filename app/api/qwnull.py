@@ -1,28 +1,33 @@
 from fastapi import APIRouter, Response
-from curl_cffi import requests
-from bs4 import BeautifulSoup
-import ddddocr
+from functools import lru_cache
 
 from databases.kv import kv
 from core.file_helper import file_manager
 
 router = APIRouter()
 
-ocr = ddddocr.DdddOcr(show_ad=False)
+# curl_cffi、ddddocr（ONNX 模型）加载都很慢，第一次调用接口时才导入
+@lru_cache(maxsize=None)
+def get_ocr():
+    import ddddocr
+    return ddddocr.DdddOcr(show_ad=False)
 
 class Qiwei:
     def __init__(self):
-        self.url =  kv.redis.get('site:url:qn63')
+        self.url =  kv.get_sync('site:url:qn63')
         if not self.url:
+            from curl_cffi import requests
+            from bs4 import BeautifulSoup
             html = requests.get('https://www.qn63.com').text
             soup = BeautifulSoup(html, "html.parser")
             self.url = soup.select('a[href]')[0].get('href')
             if self.url:
-                kv.redis.set('site:url:qn63', self.url, ex=60*60*24*3)
-        cookie = kv.redis.get('site:cookie:qn63')
+                kv.set_sync('site:url:qn63', self.url, ex=60*60*24*3)
+        cookie = kv.get_sync('site:cookie:qn63')
         self.headers = { "Cookie": cookie }
 
     def get_captcha(self) -> tuple[bytes, str]:
+        from curl_cffi import requests
         response = requests.get(self.url + '/verify/index.html', headers=self.headers)
         digits = recognize_captcha(response.content)
         return response.content, digits
@@ -31,6 +36,7 @@ class Qiwei:
         pass
     
     def verify_captcha(self, captcha: str) -> bool:
+        from curl_cffi import requests
         headers = {
             **self.headers,
             "X-Requested-With": "XMLHttpRequest"
@@ -45,7 +51,7 @@ class Qiwei:
 def recognize_captcha(image_bytes: bytes) -> str:
     # ddddocr directly supports raw image bytes
     try:
-        text = ocr.classification(image_bytes)
+        text = get_ocr().classification(image_bytes)
     except Exception as e:
         print("[OCR ERROR] type(image_bytes):", type(image_bytes))
         print("[OCR ERROR] len(image_bytes):", len(image_bytes) if image_bytes else 0)
@@ -4,24 +4,101 @@ if TYPE_CHECKING:
     from telebot.types import Message
 from services.google import gemini
 from core.string_helper import split_markdown
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Telegram 单条消息长度上限，以及流式输出时两次编辑的最小间隔（秒）
+MAX_LENGTH = 4096
+EDIT_INTERVAL = 1.0
+CURSOR = ' ▌'
 
 
 def all_text_without_command(message: 'Message') -> bool:
     return message.content_type == 'text' and not message.text.startswith('/')
 
+
+class StreamingReply:
+    """
+    把流式回答写进 Telegram：先发占位消息，收到新内容时最多每秒编辑一次，
+    超过 4096 字后当前消息定稿，剩余内容接着写进新消息
+    输出过程中用纯文本（未闭合的 markdown 会被 Telegram 拒绝），定稿时再尝试 markdown
+    """
+
+    def __init__(self, bot: 'AsyncTeleBot', message: 'Message'):
+        self.bot = bot
+        self.source = message
+        self.message: 'Message' = None
+        self.text = ''
+        self.shown = ''
+        self.edited_at = 0.0
+
+    async def start(self):
+        self.message = await self.bot.reply_to(self.source, '…')
+        self.edited_at = time.monotonic()
+
+    async def feed(self, delta: str):
+        self.text += delta
+        while len(self.text) > MAX_LENGTH:
+            # 尽量在换行处切分
+            cut = self.text.rfind('\n', MAX_LENGTH // 2, MAX_LENGTH)
+            cut = cut if cut > 0 else MAX_LENGTH
+            head, self.text = self.text[:cut], self.text[cut:].lstrip('\n')
+            await self._finalize(head)
+            self.message = await self.bot.reply_to(self.source, self.text[:MAX_LENGTH] or '…')
+            self.shown = self.text[:MAX_LENGTH]
+            self.edited_at = time.monotonic()
+        if time.monotonic() - self.edited_at >= EDIT_INTERVAL:
+            await self._edit(self.text + CURSOR if len(self.text) + len(CURSOR) <= MAX_LENGTH else self.text)
+
+    async def close(self, error: str = ''):
+        if error:
+            self.text = f'{self.text}\n\n{error}' if self.text else error
+        # 定稿时去掉光标；error 拼接后可能超长，交给 split_markdown 再分
+        parts = split_markdown(self.text) if self.text else ['(empty)']
+        await self._finalize(parts[0])
+        for part in parts[1:]:
+            await self._send_markdown(part)
+
+    async def _edit(self, text: str, parse_mode: str = None) -> bool:
+        if not text or text == self.shown and parse_mode is None:
+            return True
+        try:
+            await self.bot.edit_message_text(text, self.message.chat.id, self.message.message_id, parse_mode=parse_mode)
+        except Exception as e:
+            if 'message is not modified' not in str(e):
+                logger.warning('edit streaming message failed: %s', e)
+                return False
+        self.shown = text
+        self.edited_at = time.monotonic()
+        return True
+
+    async def _finalize(self, text: str):
+        if not await self._edit(text.replace('*', ''), parse_mode='markdown'):
+            await self._edit(text)
+
+    async def _send_markdown(self, text: str):
+        try:
+            await self.bot.reply_to(self.source, text, parse_mode='markdown')
+        except Exception as e:
+            logger.warning('markdown reply failed (%s chars): %s', len(text), e)
+            await self.bot.reply_to(self.source, text)
+
+
 def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(func=all_text_without_command)
     async def gemini_google(message: 'Message'):
         """
         Handle all other messages
         """
-        content = await gemini.ask(message.text)
-        parts = split_markdown(content)
-        # print('count of parts: ', len(parts))
-        for part in parts:
-            # print('length of part: ', len(part))
-            try:
-                await bot.reply_to(message, part, parse_mode='markdown')
-            except Exception as e:
-                print(len(part), e)
-                await bot.reply_to(message, part)
\ No newline at end of file
+        reply = StreamingReply(bot, message)
+        await reply.start()
+        try:
+            async for delta in gemini.ask_stream(message.text):
+                await reply.feed(delta)
+        except Exception as e:
+            logger.warning('gemini stream failed: %s', e)
+            await reply.close(f'[error] {e}')
+            return
+        await reply.close()
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 能确定所属会话的 update 字段，按顺序查找
+CHAT_FIELDS = (
+    'message', 'edited_message', 'channel_post', 'edited_channel_post',
+    'business_message', 'edited_business_message',
+    'my_chat_member', 'chat_member', 'chat_join_request',
+    'message_reaction', 'message_reaction_count', 'chat_boost', 'removed_chat_boost',
+)
+# 没有 chat 的 update 按用户排队
+USER_FIELDS = ('callback_query', 'inline_query', 'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'poll_answer')
+
+
+def _get(obj, name: str):
+    # 同时支持 telebot 对象和 webhook 原始 dict（dict 里用户字段叫 from）
+    if isinstance(obj, dict):
+        return obj.get('from' if name == 'from_user' else name)
+    return getattr(obj, name, None)
+
+
+def chat_key(update):
+    """update 所属的排队键：会话 id，其次用户 id，都没有时每个 update 单独一队"""
+    for name in CHAT_FIELDS:
+        chat = _get(_get(update, name), 'chat')
+        if chat is not None:
+            return _get(chat, 'id')
+    for name in USER_FIELDS:
+        obj = _get(update, name)
+        if obj is None:
+            continue
+        # 回调按钮所在消息的会话优先，和该会话的消息保持顺序
+        chat = _get(_get(obj, 'message'), 'chat')
+        if chat is not None:
+            return _get(chat, 'id')
+        user = _get(obj, 'from_user') or _get(obj, 'user')
+        if user is not None:
+            return f'user:{_get(user, "id")}'
+    return f'update:{_get(update, "update_id") or id(update)}'
+
+
+class ChatDispatcher:
+    """
+    同一会话的 update 严格按顺序处理，不同会话并行，总并发不超过 concurrency
+    每个会话最多积压 per_chat 条，满了之后该会话的新 update 直接丢弃并计数，
+    submit 永远不会挂起，一个刷屏的会话不会占住 webhook worker 或 polling 任务而拖慢其他会话
+    webhook 入口在入队前用 is_full 检查，满了返回 503 让 Telegram 稍后重投
+    webhook 和 polling 共用：install 后 bot.process_new_updates 变为入队
+    """
+
+    def __init__(self, process: Callable[[list], Awaitable], concurrency: int = 16, per_chat: int = 50):
+        self.process = process
+        self.concurrency = concurrency
+        self.per_chat = per_chat
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[object, asyncio.Queue] = {}
+        self._runners: Dict[object, asyncio.Task] = {}
+        self.running = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @classmethod
+    def install(cls, bot, **kwargs) -> 'ChatDispatcher':
+        """替换 bot.process_new_updates，polling 和 webhook 的 update 都经过分发器"""
+        dispatcher = cls(bot.process_new_updates, **kwargs)
+        bot.process_new_updates = dispatcher.submit
+        return dispatcher
+
+    def is_full(self, key) -> bool:
+        queue = self._queues.get(key)
+        return queue is not None and queue.full()
+
+    async def submit(self, updates: list, wait: bool = False):
+        """
+        按会话入队，不会因为某个会话积压而等待；积压已满的 update 被丢弃
+        wait=True 时等待这些 update 全部处理完（handler 的异常、会话积压已满的 QueueFull 会抛出）
+        """
+        futures = []
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        for update in updates:
+            key = chat_key(update)
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = asyncio.Queue(self.per_chat)
+            future = loop.create_future() if wait else None
+            try:
+                queue.put_nowait((update, future))
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning('chat %s has %s pending updates, update %s dropped', key, queue.qsize(), getattr(update, 'update_id', None))
+                if wait:
+                    raise
+                continue
+            if future is not None:
+                futures.append(future)
+            runner = self._runners.get(key)
+            if runner is None or runner.done():
+                self._runners[key] = asyncio.create_task(self._run(key, queue))
+        if futures:
+            await asyncio.gather(*futures)
+
+    async def _run(self, key, queue: asyncio.Queue):
+        try:
+            while not queue.empty():
+                update, future = queue.get_nowait()
+                async with self._semaphore:
+                    self.running += 1
+                    try:
+                        await self.process([update])
+                        self.processed += 1
+                        if future is not None and not future.done():
+                            future.set_result(None)
+                    except Exception as e:
+                        self.failed += 1
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                        else:
+                            logger.exception('process update failed, chat=%s', key)
+                    finally:
+                        self.running -= 1
+                        queue.task_done()
+        finally:
+            # 队列空了才退出，退出前没有 await，submit 也不会挂起，两者不会竞争
+            if self._runners.get(key) is asyncio.current_task():
+                del self._runners[key]
+                if queue.empty():
+                    self._queues.pop(key, None)
+
+    async def stop(self, timeout: float = 10):
+        """等待已入队的 update 处理完，超时后取消"""
+        runners = list(self._runners.values())
+        if not runners:
+            return
+        done, pending = await asyncio.wait(runners, timeout=timeout)
+        if pending:
+            logger.warning('dispatcher stop timeout, %s chats still pending', len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        depths = [queue.qsize() for queue in self._queues.values()]
+        return {
+            'chats': len(self._runners),
+            'pending': sum(depths),
+            'max_chat_pending': max(depths, default=0),
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'processed': self.processed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }
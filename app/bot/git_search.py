@@ -4,6 +4,7 @@ if TYPE_CHECKING:
     from telebot.types import Message, CallbackQuery
 from services.git import git
 from core.string_helper import create_page_buttons, create_progress_bar
+from bot.routing import get_router
 import html
 
 
@@ -11,6 +12,7 @@ cmd_gitserach = 'gitsearch'
 def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(commands=[cmd_gitserach])
     async def git_search_code(message: 'Message'):
+        """搜索 GitHub 代码：/gitsearch 关键词,天数,数量"""
         text = message.text[len(cmd_gitserach)+2:].split(',')
         q, days, max_count = (text + [''] * 3)[:3]  # 解构赋值，并用空字符串填充不足的部分
         q = q.strip()
@@ -26,7 +28,7 @@ def register_handler(bot: 'AsyncTeleBot'):
         else:
             await bot.send_message(message.chat.id, 'error')
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith(('prev_', 'next_', 'page_')))
+    @get_router(bot).callback('prev_', 'next_', 'page_')
     async def callback_query(call: 'CallbackQuery'):
         page_num = int(call.data.split('_')[1])
         # global save_gitserach
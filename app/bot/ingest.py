@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# update 字段名与 handler 列表名不一致的情况，其余都是 f'{field}_handlers'
+HANDLER_ATTRS = {
+    'inline_query': 'inline_handlers',
+    'chosen_inline_result': 'chosen_inline_handlers',
+}
+
+
+def loads(body: bytes):
+    """直接解析原始字节，不先解码成 str"""
+    return json.loads(body)
+
+
+def is_handled(bot, update: dict) -> bool:
+    """
+    update 类型没有注册任何 handler、middleware 和 update_listener 时返回 False，
+    可以直接丢弃而不构建 telebot 对象；不认识的类型一律视为需要处理
+    """
+    if bot.update_listener:
+        return True
+    for field in update:
+        if field == 'update_id':
+            continue
+        handlers = getattr(bot, HANDLER_ATTRS.get(field, f'{field}_handlers'), None)
+        if handlers is None or handlers:
+            return True
+        if any(field in middleware.update_types for middleware in bot.middlewares):
+            return True
+    return False
+
+
+class UpdateQueue:
+    """
+    webhook 收到更新后只入队并立即返回，由固定数量的 worker 在后台处理
+    Telegram 超时或失败重投时会重复推送同一 update_id，最近见过的 id 直接丢弃
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list], Awaitable],
+        workers: int = 8,
+        maxsize: int = 1000,
+        seen_size: int = 4096,
+        parse: Optional[Callable] = None,
+    ):
+        """
+        :param parse: worker 处理前对入队数据的转换（例如 Update.de_json），让请求线程只做入队
+        """
+        self.process = process
+        self.parse = parse
+        self.workers = workers
+        self.seen_size = seen_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._seen: OrderedDict = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.processed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def seen(self, update_id) -> bool:
+        if update_id is None:
+            return False
+        if update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            return True
+        return False
+
+    def _remember(self, update_id):
+        if update_id is None:
+            return
+        self._seen[update_id] = None
+        while len(self._seen) > self.seen_size:
+            self._seen.popitem(last=False)
+
+    def put(self, update_id, update) -> bool:
+        """
+        入队，重复的 update 视为成功；队列满返回 False，
+        调用方应返回非 2xx 让 Telegram 稍后重投，而不是在请求里等待
+        """
+        if self.seen(update_id):
+            self.duplicates += 1
+            return True
+        self.start()
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self._remember(update_id)
+        return True
+
+    def start(self):
+        """在当前事件循环上启动 worker，可重复调用"""
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self, timeout: float = 10):
+        """等待已入队的更新处理完（最多 timeout 秒），然后停止 worker"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('webhook queue stop timeout, %s updates dropped', self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            self.busy += 1
+            try:
+                if self.parse is not None:
+                    update = self.parse(update)
+                await self.process([update])
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception('process update failed')
+            finally:
+                self.busy -= 1
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.queue.qsize(),
+            'maxsize': self.queue.maxsize,
+            'busy': self.busy,
+            'workers': len(self._tasks),
+            'processed': self.processed,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'skipped': self.skipped,
+            'failed': self.failed,
+        }
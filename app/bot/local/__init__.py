@@ -1,6 +1,7 @@
 import os
 import importlib
 import pkgutil
+from bot.routing import get_router
 
 def register_handlers(bot):
     package_name = __name__  # bot.local
@@ -22,4 +23,6 @@ def register_handlers(bot):
     for module in private_modules + public_modules:
         register_func = getattr(module, "register_handler", None)
         if callable(register_func):
-            register_func(bot)
\ No newline at end of file
+            register_func(bot)
+    # 命令 handler 收进路由索引，每个 update 只做一次查表
+    get_router(bot).install()
\ No newline at end of file
@@ -9,11 +9,13 @@ CHAT_PAYLOADS = {}
 def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(commands=['115login'])
     async def login(message: 'Message'):
+        """115 扫码登录"""
         data = pan115.start_login()
         await bot.send_photo(message.chat.id, data["qrcode"])
 
     @bot.message_handler(commands=['115token'])
     async def token(message: 'Message'):
+        """查询扫码状态并获取 115 token"""
         info = pan115.check_login_status("qandroid")
 
         status = info.get("status")
@@ -2,69 +2,124 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from telebot.async_telebot import AsyncTeleBot
     from telebot.types import Message
+    from core.req import HttpResponse
 from core.req import http_client
 from databases.kv import kv
+from services.feeds import feeds
 from datetime import datetime
-import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# /today 和 /news 会同时打多个 60s-api 接口，平滑突发避免被上游限流
+http_client.set_host_limit('60s-api.viki.moe', max_in_flight=4, rate=5)
+
+
+UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
+NEWS_FEEDS = [
+    ('头条热榜', 'http://60s-api.viki.moe/v2/toutiao'),
+    ('微博热搜', 'https://60s-api.viki.moe/v2/weibo'),
+    ('抖音热榜', 'https://60s-api.viki.moe/v2/douyin'),
+]
+
+
+async def load_today() -> dict | None:
+    """/today 的快照：农历和 60s 新闻拼好的文本和封面"""
+    formatted_date = datetime.now().strftime("%Y-%m-%d")
+    req_rili = {'url': 'https://www.36jxs.com/api/Commonweal/almanac', 'params': {'sun': formatted_date}, 'headers': {'User-Agent': UA}}
+    req_60s = {'url': 'https://60s-api.viki.moe/v2/60s'}
+    res_rili, res_60s = await fetch_all([req_rili, req_60s])
+
+    parts = []
+    cover = None
+    if res_rili and res_rili.status_code == 200:
+        json_data: dict = res_rili.json().get('data', {})
+        content = f"农历 {json_data.get('LMonth')}{json_data.get('LDay')} {json_data.get('SolarTermName')}\n"
+        parts.append(content)
+    if res_60s and res_60s.status_code == 200:
+        json_data = res_60s.json().get('data', {})
+        cover = json_data.get('cover')
+        parts += [f'· {x}' for x in json_data.get('news', [])]
+    if not parts:
+        return None
+    return {'date': formatted_date, 'cover': cover, 'text': '\n'.join(parts)}
+
+
+async def load_news() -> list[tuple[str, list[dict]]] | None:
+    """/news 的快照：各榜单的原始条目，去重（filter_news）仍在命令到来时进行"""
+    responses = await fetch_all([{'url': url} for _, url in NEWS_FEEDS])
+    if not any(responses):
+        return None
+    return [
+        (title, res.json().get('data', []) if res else [])
+        for (title, _), res in zip(NEWS_FEEDS, responses)
+    ]
+
+
+# 刷新间隔本身就是缓存周期，loader 里的请求不再带 cache_ttl，否则快照可能比间隔更旧
+feeds.register('today', load_today, interval=600)
+feeds.register('news', load_news, interval=120)
 
 
 def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(commands=['today'])
     async def today(message: 'Message'):
-        current_date = datetime.now()
-        formatted_date = current_date.strftime("%Y-%m-%d")
-        req_rili = http_client.get('https://www.36jxs.com/api/Commonweal/almanac', params={'sun': formatted_date}, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'})
-        req_60s = http_client.get('https://60s-api.viki.moe/v2/60s')
-        res_rili, res_60s = await asyncio.gather(req_rili, req_60s)
-
-        parts = []
-        if res_rili.status_code == 200:
-            json_data: dict = res_rili.json().get('data', {})
-            content = f"农历 {json_data.get('LMonth')}{json_data.get('LDay')} {json_data.get('SolarTermName')}\n"
-            parts.append(content)
-        if res_60s.status_code == 200:
-            json_data = res_60s.json().get('data', {})
-            cover = json_data.get('cover')
-            parts += [f'· {x}' for x in json_data.get('news', [])]
-        await bot.send_photo(message.chat.id, cover or 'https://www.xvfr.com/60s.php', '\n'.join(parts))
+        """今日农历和 60 秒新闻"""
+        snapshot = await feeds.get('today')
+        if snapshot and snapshot['date'] != datetime.now().strftime("%Y-%m-%d"):
+            # 跨天后旧快照的农历已不对，现场刷新
+            snapshot = await feeds.refresh('today')
+        cover = snapshot['cover'] if snapshot else None
+        text = snapshot['text'] if snapshot else ''
+        await bot.send_photo(message.chat.id, cover or 'https://www.xvfr.com/60s.php', text)
 
     @bot.message_handler(commands=['news'])
     async def news(message: 'Message'):
+        """头条、微博、抖音热榜（只推送没看过的）"""
         news = []
-        req_toutiao = http_client.get('http://60s-api.viki.moe/v2/toutiao')
-        req_weibo = http_client.get('https://60s-api.viki.moe/v2/weibo')
-        req_douyin = http_client.get('https://60s-api.viki.moe/v2/douyin')
-        res_toutiao, res_weibo, res_douyin = await asyncio.gather(req_toutiao, req_weibo, req_douyin)
-
-        # news.append('\n头条热榜')
-        json_data: list[dict] = res_toutiao.json().get('data', [])
-        # news += [f"· {x.get('title')} <a href='{x.get('link')}'>🔗</a>" for x in json_data[:10]]
-        news += filter_news(json_data, 10, '头条热榜')
-
-        # news.append('\n微博热搜')
-        json_data = res_weibo.json().get('data', [])
-        # news += [f"· {x.get('title')} <a href='{x.get('link')}'>🔗</a>" for x in json_data[:10]]
-        news += filter_news(json_data, 10, '微博热搜')
-
-        # news.append('\n抖音热榜')
-        json_data = res_douyin.json().get('data', [])
-        # news += [f"· {x.get('title')} <a href='{x.get('link')}'>🔗</a>" for x in json_data[:10]]
-        news += filter_news(json_data, 10, '抖音热榜')
+        for title, items in await feeds.get('news') or []:
+            news += await filter_news(items, 10, title)
 
         content = '\n'.join([f'{x}' for x in news])
         await bot.send_message(message.chat.id, content, disable_web_page_preview=True, parse_mode='HTML')
 
-def filter_news(data: list[dict], total: int = 10, title: str = '') -> list[str]:
-    result = [f'\n{title}']
-    count = 0
-    for news in data:
-        if count >= total:
-            break
-        added = kv.redis.setnx(news.get('link'), news.get('title')) 
-        if added:
-            kv.redis.expire(news.get('link'), 86400)
-            count += 1
-            result.append(f"· {news.get('title')} <a href='{news.get('link')}'>🔗</a>")
-    if count == 0:
+async def fetch_all(requests: list[dict]) -> list['HttpResponse | None']:
+    """并发请求，按原顺序返回响应，单个请求失败时对应位置为 None"""
+    responses = [None] * len(requests)
+    async for result in http_client.fetch_many(requests):
+        if result.ok:
+            responses[result.index] = result.result
+        else:
+            logger.warning("[%s] -> (error=%s)", result.item.get('url'), result.error)
+    return responses
+
+# 依次对每个 link 执行 SET NX EX，新增满 ARGV[1] 条后停止，返回新增条目的下标（从 1 开始）
+# 保持逐条 setnx 时“只占用前 total 条新闻”的语义，但整批只需一次往返
+CLAIM_NEW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local added = {}
+for i, key in ipairs(KEYS) do
+    if #added >= limit then break end
+    if redis.call('SET', key, ARGV[i + 2], 'NX', 'EX', ttl) then
+        added[#added + 1] = i
+    end
+end
+return added
+"""
+
+async def filter_news(data: list[dict], total: int = 10, title: str = '', ttl: int = 86400) -> list[str]:
+    data = [news for news in data if news.get('link')]
+    if not data:
         return []
+    script = kv.aredis.register_script(CLAIM_NEW_SCRIPT)
+    links = [news.get('link') for news in data]
+    titles = [news.get('title') or '' for news in data]
+    added = await script(keys=links, args=[total, ttl, *titles])
+    if not added:
+        return []
+    result = [f'\n{title}']
+    for i in added:
+        news = data[i - 1]
+        result.append(f"· {news.get('title')} <a href='{news.get('link')}'>🔗</a>")
     return result
\ No newline at end of file
@@ -11,6 +11,7 @@ def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(commands=[cmd_redis])
     async def redis_handler(message: 'Message'):
         """
+        保存数据到 redis
         用法：
             /redis set key value
         （仅支持 set，用于存储敏感数据）
@@ -28,8 +29,8 @@ def register_handler(bot: 'AsyncTeleBot'):
         if action == "set":
             try:
                 value = text[3].encode().decode("unicode_escape")
-                db.redis.set(key, value)
-                ttl = db.redis.ttl(key)
+                await db.set(key, value)
+                ttl = await db.aredis.ttl(key)
                 await bot.reply_to(message, f"已保存: {ttl}")
             except Exception as e:
                 await bot.reply_to(message, f"保存失败：{e}")
@@ -0,0 +1,144 @@
+import inspect
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+if TYPE_CHECKING:
+    from telebot.async_telebot import AsyncTeleBot
+    from telebot.types import Message, CallbackQuery
+from telebot.util import extract_command
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixTrie:
+    """按字符建的前缀树，match 返回最长匹配前缀对应的值"""
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+
+    def insert(self, prefix: str, value):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if None not in node:
+            self.size += 1
+        # None 键存放在该前缀结束处注册的值
+        node[None] = value
+
+    def match(self, text: str):
+        node, found = self.root, self.root.get(None)
+        for char in text or '':
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        return found
+
+
+class CommandRouter:
+    """
+    命令路由索引：纯命令的 message handler 收拢成一个 handler，按命令名查 dict 分发，
+    callback_query 按 data 前缀查前缀树，telebot 每个 update 只需测试一个过滤器
+    注册方式不变（@bot.message_handler(commands=[...])），register 完所有模块后调用 install
+    """
+
+    def __init__(self, bot: 'AsyncTeleBot'):
+        self.bot = bot
+        self.commands: Dict[str, dict] = {}
+        self.callbacks = PrefixTrie()
+        self._params: Dict[Callable, list] = {}
+        self._help: Optional[str] = None
+        self._message_entry = {
+            'function': self._route_message,
+            'pass_bot': False,
+            'filters': {'content_types': ['text'], 'func': self._has_command},
+        }
+        self._callback_entry = {
+            'function': self._route_callback,
+            'pass_bot': False,
+            'filters': {'func': self._has_callback},
+        }
+
+    def callback(self, *prefixes: str):
+        """按 callback data 前缀注册 handler，替代 callback_query_handler(func=lambda c: c.data.startswith(...))"""
+        def decorator(function):
+            entry = {'function': function, 'pass_bot': False, 'filters': {}}
+            for prefix in prefixes:
+                self.callbacks.insert(prefix, entry)
+            return function
+        return decorator
+
+    @staticmethod
+    def _indexable(handler: dict) -> bool:
+        # 带 func / regexp / chat_types 等其他过滤条件的命令 handler 保留在 telebot 的列表里
+        filters = handler['filters']
+        return bool(filters.get('commands')) and set(filters) <= {'commands', 'content_types'} \
+            and filters.get('content_types') in (None, ['text'])
+
+    def install(self):
+        """把已注册的纯命令 handler 收进索引，可重复调用（新注册的 handler 会被补进来）"""
+        kept, position = [], None
+        for handler in self.bot.message_handlers:
+            if handler is self._message_entry or self._indexable(handler):
+                # 路由 handler 放在第一个命令 handler 原来的位置，和其他 handler 的先后顺序不变
+                if position is None:
+                    position = len(kept)
+                if handler is not self._message_entry:
+                    for command in handler['filters']['commands']:
+                        # 与 telebot 一致，先注册的优先
+                        self.commands.setdefault(command, handler)
+                continue
+            kept.append(handler)
+        if position is not None:
+            kept.insert(position, self._message_entry)
+        self.bot.message_handlers[:] = kept
+
+        if self.callbacks.size and self._callback_entry not in self.bot.callback_query_handlers:
+            self.bot.callback_query_handlers.insert(0, self._callback_entry)
+        self._help = None
+        logger.debug('routing %s commands, %s callback prefixes', len(self.commands), self.callbacks.size)
+
+    def _has_command(self, message: 'Message') -> bool:
+        return extract_command(message.text) in self.commands
+
+    def _has_callback(self, call: 'CallbackQuery') -> bool:
+        return self.callbacks.match(call.data) is not None
+
+    async def _call(self, handler: dict, obj, data: dict):
+        function = handler['function']
+        params = self._params.get(function)
+        if params is None:
+            params = self._params[function] = list(inspect.signature(function).parameters)[1:]
+        kwargs = {key: value for key, value in data.items() if key in params}
+        if handler.get('pass_bot'):
+            kwargs['bot'] = self.bot
+        return await function(obj, **kwargs)
+
+    async def _route_message(self, message: 'Message', data: dict):
+        handler = self.commands.get(extract_command(message.text))
+        if handler is not None:
+            return await self._call(handler, message, data)
+
+    async def _route_callback(self, call: 'CallbackQuery', data: dict):
+        handler = self.callbacks.match(call.data)
+        if handler is not None:
+            return await self._call(handler, call, data)
+
+    def help_text(self) -> str:
+        """/help 内容：命令 - handler docstring 第一行，install 后缓存"""
+        if self._help is None:
+            lines = []
+            for command, handler in self.commands.items():
+                doc = inspect.getdoc(handler['function']) or ''
+                lines.append(f'/{command} - {doc.splitlines()[0]}' if doc else f'/{command}')
+            self._help = '\n'.join(lines)
+        return self._help
+
+
+def get_router(bot: 'AsyncTeleBot') -> CommandRouter:
+    """每个 bot 一个路由索引，挂在 bot 上，不受 bot.xxx / app.bot.xxx 两种导入路径影响"""
+    router = getattr(bot, '_command_router', None)
+    if router is None:
+        router = bot._command_router = CommandRouter(bot)
+    return router
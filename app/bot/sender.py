@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telebot.asyncio_helper import ApiTelegramException, RequestTimeout
+from core.limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 优先级通道，数值越小越先发
+HIGH, NORMAL, LOW = 0, 1, 2
+
+
+@dataclass
+class SendJob:
+    """一次批量推送的进度"""
+    id: str
+    total: int
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    errors: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.sent + self.failed >= self.total
+
+    def finish_one(self, ok: bool, chat_id=None, error: str = None):
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+            # 错误明细只保留前 100 条
+            if len(self.errors) < 100:
+                self.errors.append({'chat_id': chat_id, 'error': error})
+        if self.done:
+            self.finished_at = time.time()
+
+    def progress(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        return {
+            'job': self.id,
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'pending': self.total - self.sent - self.failed,
+            'done': self.done,
+            'elapsed': round(elapsed, 2),
+            'errors': self.errors,
+        }
+
+
+@dataclass
+class Outgoing:
+    chat_id: Any
+    call: Callable[[], Awaitable]
+    job: Optional[SendJob] = None
+    future: Optional[asyncio.Future] = None
+    attempts: int = 0
+
+
+class SendScheduler:
+    """
+    Telegram 出站消息调度：全局约 30 条/秒、单个会话 1 条/秒
+    - 每个会话一个按 (优先级, 入队顺序) 排序的队列，调度的是会话而不是单条消息：
+      只有队首消息可以发送，同一会话同一优先级的消息严格按入队顺序送达
+    - 会话未到时间时整个会话延后重新调度，不占用 worker，也不挡住其他会话
+    - 429 按 retry_after 暂停发送后重试，网络错误和 5xx 退避重试，重试的消息仍留在队首
+    - 403/400 等不可恢复的错误直接记为失败
+    """
+
+    def __init__(self, rate: float = 30, per_chat_rate: float = 1, workers: int = 8, max_attempts: int = 5, max_jobs: int = 100):
+        self.bucket = TokenBucket(rate, int(rate))
+        self.per_chat_rate = per_chat_rate
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.max_jobs = max_jobs
+        # 待调度的会话 (优先级, 队首消息序号, chat_id)；每个会话同一时刻只在这里、延后定时器或 worker 中出现一次
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.jobs: OrderedDict[str, SendJob] = OrderedDict()
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._pending: Dict[Any, list] = {}
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._delayed = 0
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def start(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self, timeout: float = 10):
+        """等待所有会话队列（含延后重试的消息）发完，最多 timeout 秒"""
+        if not self._tasks:
+            return
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _schedule(self, chat_id):
+        priority, seq, _ = self._pending[chat_id][0]
+        self.queue.put_nowait((priority, seq, chat_id))
+
+    def _schedule_later(self, delay: float, chat_id):
+        self._delayed += 1
+
+        def requeue():
+            self._delayed -= 1
+            self._schedule(chat_id)
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    def submit(self, chat_id, call: Callable[[], Awaitable], priority: int = NORMAL, job: SendJob = None) -> asyncio.Future:
+        """入队一条消息，call 是发送函数（例如 lambda: bot.send_message(...)），返回发送结果的 future"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.get(chat_id)
+        idle = pending is None
+        if idle:
+            pending = self._pending[chat_id] = []
+        heapq.heappush(pending, (priority, next(self._seq), Outgoing(chat_id, call, job, future)))
+        # 会话已在调度中时只追加到它的队列，由正在调度它的 worker 依次发送
+        if idle:
+            self._schedule(chat_id)
+        return future
+
+    async def send(self, chat_id, call: Callable[[], Awaitable], priority: int = HIGH):
+        """发送并等待结果，失败时抛出最后一次的异常"""
+        return await self.submit(chat_id, call, priority)
+
+    def broadcast(self, messages: List[tuple], priority: int = LOW) -> SendJob:
+        """
+        批量入队，messages 为 [(chat_id, call), ...]，立即返回任务，进度通过 job(id) 查询
+        """
+        job = SendJob(uuid.uuid4().hex[:12], len(messages))
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        for chat_id, call in messages:
+            future = self.submit(chat_id, call, priority, job)
+            # 批量任务不等待结果，异常已记录在 job 中
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if not messages:
+            job.finished_at = time.time()
+        return job
+
+    def job(self, job_id: str) -> Optional[SendJob]:
+        return self.jobs.get(job_id)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # 清理已经回满、没有积压的会话
+                self._chats = {k: b for k, b in self._chats.items() if b.delay() > 0 or k in self._pending}
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            _, _, chat_id = await self.queue.get()
+            try:
+                wait = self._chat_bucket(chat_id).try_acquire()
+                if wait > 0:
+                    self._schedule_later(wait, chat_id)
+                    continue
+                if (pause := self._paused_until - time.monotonic()) > 0:
+                    await asyncio.sleep(pause)
+                await self.bucket.acquire()
+                pending = self._pending[chat_id]
+                head = pending[0]
+                delay = await self._send(head[2])
+                if delay is not None:
+                    # 重试的消息保留原序号，仍在队首，后面的消息不会越过它
+                    self._schedule_later(delay, chat_id)
+                    continue
+                if pending[0] is head:
+                    heapq.heappop(pending)
+                else:
+                    # 发送期间入队了更高优先级的消息，队首已经变了
+                    pending.remove(head)
+                    heapq.heapify(pending)
+                if pending:
+                    self._schedule(chat_id)
+                else:
+                    del self._pending[chat_id]
+            finally:
+                self.queue.task_done()
+
+    async def _send(self, item: Outgoing) -> Optional[float]:
+        """发送队首消息，需要重试时返回等待秒数，否则返回 None（已成功或记为失败）"""
+        item.attempts += 1
+        try:
+            result = await item.call()
+        except Exception as e:
+            delay = self._retry_delay(item, e)
+            if delay is not None and item.attempts < self.max_attempts:
+                if item.job:
+                    item.job.retried += 1
+                return delay
+            self.failed += 1
+            logger.warning('send to %s failed after %s attempts: %s', item.chat_id, item.attempts, e)
+            if item.job:
+                item.job.finish_one(False, item.chat_id, str(e))
+            if not item.future.done():
+                item.future.set_exception(e)
+            return None
+        self.sent += 1
+        if item.job:
+            item.job.finish_one(True)
+        if not item.future.done():
+            item.future.set_result(result)
+        return None
+
+    def _retry_delay(self, item: Outgoing, e: Exception) -> Optional[float]:
+        """返回重试前需要等待的秒数，None 表示不可重试"""
+        if isinstance(e, ApiTelegramException):
+            if e.error_code == 429:
+                self.throttled += 1
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                # 429 说明已经超出限额，同时暂停全局发送，避免其他会话也被限
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                return retry_after
+            if e.error_code >= 500:
+                return min(2 ** item.attempts, 30)
+            return None
+        if isinstance(e, (RequestTimeout, asyncio.TimeoutError, ConnectionError, OSError)):
+            return min(2 ** item.attempts, 30)
+        # aiohttp 的连接错误
+        if type(e).__module__.startswith('aiohttp'):
+            return min(2 ** item.attempts, 30)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            'queued': sum(len(pending) for pending in self._pending.values()),
+            'pending_chats': len(self._pending),
+            'delayed': self._delayed,
+            'paused': round(max(0.0, self._paused_until - time.monotonic()), 1),
+            'chats': len(self._chats),
+            'sent': self.sent,
+            'failed': self.failed,
+            'throttled': self.throttled,
+            'jobs': sum(1 for job in self.jobs.values() if not job.done),
+        }
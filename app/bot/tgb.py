@@ -1,33 +1,78 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 from telebot.async_telebot import AsyncTeleBot
 from core.config import config
+from core.startup import timed
+from bot.ingest import UpdateQueue, is_handled, loads
+from bot.dispatch import ChatDispatcher, chat_key
+from bot.routing import get_router
+from bot.sender import SendScheduler, HIGH, NORMAL, LOW
 import telebot
 import importlib
+import hmac
 
 router = APIRouter()
 bot = AsyncTeleBot(config.BOT_HTTP_TOKEN) if config.BOT_HTTP_TOKEN else None
 if bot:
     MODULES = ["chat", "git_search", "others", "welcome", "redisdb"]
     for mod in MODULES:
-        module = importlib.import_module(f'bot.{mod}')
-        module.register_handler(bot)
+        with timed(f'bot.{mod}'):
+            module = importlib.import_module(f'bot.{mod}')
+            module.register_handler(bot)
+    get_router(bot).install()
+    dispatcher = ChatDispatcher.install(bot, concurrency=config.DISPATCH_CONCURRENCY, per_chat=config.DISPATCH_PER_CHAT)
+    # worker 只负责把 update 交给分发器，实际并发由分发器控制
+    update_queue = UpdateQueue(
+        bot.process_new_updates,
+        workers=config.WEBHOOK_WORKERS,
+        maxsize=config.WEBHOOK_QUEUE_SIZE,
+        parse=telebot.types.Update.de_json,
+    )
+    sender = SendScheduler()
+else:
+    dispatcher = None
+    update_queue = None
+    sender = None
+
+PRIORITIES = {'high': HIGH, 'normal': NORMAL, 'low': LOW}
 
 @router.post(f'/webhook')
-async def process_webhook(update: dict):
+async def process_webhook(request: Request):
     """
     Process webhook calls
+    直接读原始 body 解析一次，不经过 FastAPI 的参数校验；没有 handler 的 update 类型直接丢弃
+    只入队不等待处理，慢 handler 不会拖住 Telegram 的连接；队列满时返回 503 让 Telegram 稍后重投
     """
-    if update:
-        update = telebot.types.Update.de_json(update)
-        await bot.process_new_updates([update])
-    else:
+    if config.BOT_WEBHOOK_SECRET:
+        token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(token.encode(), config.BOT_WEBHOOK_SECRET.encode()):
+            return Response(status_code=403)
+
+    body = await request.body()
+    if not body:
+        return
+    try:
+        update = loads(body)
+    except ValueError:
+        return Response(status_code=400)
+    if not isinstance(update, dict) or not update:
+        return
+
+    if not is_handled(bot, update):
+        update_queue.skipped += 1
         return
+    # 该会话积压已满时让 Telegram 稍后重投，而不是在分发器里丢弃
+    if dispatcher.is_full(chat_key(update)):
+        update_queue.rejected += 1
+        return Response(status_code=503)
+    # Update 对象在 worker 中构建
+    if not update_queue.put(update.get('update_id'), update):
+        return Response(status_code=503)
     
 @router.post(f'/set_webhook')
 async def set_webhook(request: Request):
     form = await request.form()
     try:
-        await bot.set_webhook(url=form.get('url'))
+        await bot.set_webhook(url=form.get('url'), secret_token=config.BOT_WEBHOOK_SECRET)
         return 'ok'
     except Exception as e:
         return 'error'
@@ -48,6 +93,14 @@ async def del_webhook():
     except Exception as e:
         return 'error'
 
+def push_call(chat_id, message: str = '', photo: str = '', html: str = ''):
+    if photo:
+        return lambda: bot.send_photo(chat_id, photo=photo, caption=message)
+    elif html:
+        return lambda: bot.send_message(chat_id, html, parse_mode='html')
+    else:
+        return lambda: bot.send_message(chat_id, message)
+
 @router.post('/push')
 async def push(request: Request):
     form = await request.form()
@@ -56,15 +109,49 @@ async def push(request: Request):
         message: str = form.get('message', '')
         photo: str = form.get('photo', '')
         html: str = form.get('html', '')
-        if photo:
-            await bot.send_photo(chat_id, photo=photo, caption=message)
-        elif html:
-            await bot.send_message(chat_id, html, parse_mode='html')  
-        else:
-            await bot.send_message(chat_id, message)
+        # 经过发送调度器，遵守 Telegram 限频，429 会自动等待重试
+        await sender.send(chat_id, push_call(chat_id, message, photo, html))
         return 'ok'
     except Exception as e:
         return 'error'
+
+@router.post('/push-batch')
+async def push_batch(request: Request):
+    """
+    批量推送，全部入队后立即返回任务 id，进度通过 /push-batch/{job} 查询
+    请求体: {"ids": [...], "message"/"html"/"photo": ...} 同一内容发给多个会话
+        或 {"messages": [{"id": ..., "message": ..., "html": ..., "photo": ...}, ...]}
+    priority: high / normal / low（默认 low，不影响单条 /push）
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return {"error": "invalid json body"}
+    if not isinstance(data, dict):
+        return {"error": "invalid json body"}
+
+    items = data.get('messages')
+    if items is None:
+        common = {k: data.get(k, '') for k in ('message', 'photo', 'html')}
+        items = [{'id': chat_id, **common} for chat_id in data.get('ids') or []]
+    if not isinstance(items, list) or not items:
+        return {"error": "missing ids or messages"}
+    if any(not isinstance(item, dict) or not item.get('id') for item in items):
+        return {"error": "every message needs an id"}
+
+    messages = [
+        (item['id'], push_call(item['id'], item.get('message', ''), item.get('photo', ''), item.get('html', '')))
+        for item in items
+    ]
+    job = sender.broadcast(messages, PRIORITIES.get(data.get('priority'), LOW))
+    return {"job": job.id, "total": job.total}
+
+@router.get('/push-batch/{job_id}')
+async def push_batch_progress(job_id: str):
+    job = sender.job(job_id)
+    if job is None:
+        return {"error": "job not found"}
+    return job.progress()
     
 def form_or_json(request: Request) -> dict:
     if "application/json" in request.headers.get("Content-Type"):
@@ -94,8 +181,8 @@ async def trigger_bot(request: Request):
         }
 
         # 调用 Telegram bot handler 处理消息
-        # 手动调用 handler
-        await bot.process_new_updates([telebot.types.Update.de_json(json_message)])
+        # 手动调用 handler，等待处理完成
+        await dispatcher.submit([telebot.types.Update.de_json(json_message)], wait=True)
 
         return {"message": "Bot handled the message successfully!"}
     except Exception as e:
@@ -7,6 +7,7 @@ if TYPE_CHECKING:
 def register_handler(bot: 'AsyncTeleBot'):
     @bot.message_handler(commands=['start'])
     async def send_welcome(message: 'Message'):
+        """欢迎信息"""
         await bot.reply_to(message, """
 Use Less BOT
 """)
\ No newline at end of file
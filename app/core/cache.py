@@ -0,0 +1,94 @@
+import base64
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from typing import Optional, Dict
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: Optional[bytes]
+    encoding: Optional[str]
+    response_headers: Dict[str, str] = field(default_factory=dict)
+    expires_at: float = 0.0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def dumps(self) -> str:
+        data = asdict(self)
+        data['content'] = base64.b64encode(self.content).decode() if self.content is not None else None
+        return json.dumps(data)
+
+    @classmethod
+    def loads(cls, raw: str) -> 'CacheEntry':
+        data = json.loads(raw)
+        if data.get('content') is not None:
+            data['content'] = base64.b64decode(data['content'])
+        return cls(**data)
+
+
+class MemoryCache:
+    """进程内 LRU 缓存，过期条目保留到被淘汰，用于 ETag/Last-Modified 条件请求"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class RedisCache:
+    """基于 databases.kv 的缓存，多进程共享；过期后再保留 stale_ttl 秒用于条件请求"""
+
+    def __init__(self, prefix: str = 'http:cache:', stale_ttl: int = 3600):
+        self.prefix = prefix
+        self.stale_ttl = stale_ttl
+
+    @property
+    def redis(self):
+        from databases.kv import kv
+        return kv.aredis
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self.redis.get(self.prefix + key)
+        if not raw:
+            return None
+        try:
+            return CacheEntry.loads(raw)
+        except (ValueError, TypeError):
+            return None
+
+    async def set(self, key: str, entry: CacheEntry):
+        ttl = max(1, int(entry.expires_at - time.time())) + self.stale_ttl
+        await self.redis.set(self.prefix + key, entry.dumps(), ex=ttl)
+
+    async def delete(self, key: str):
+        await self.redis.delete(self.prefix + key)
@@ -11,11 +11,18 @@ class Config:
     TG_CHANNEL_ID = os.getenv('TG_CHANNEL_ID')
     TG_SESSION = os.getenv('TG_SESSION')
     BOT_HTTP_TOKEN = os.getenv('BOT_HTTP_TOKEN')
+    BOT_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET')
     BOT_HTTP_TOKEN_NEW = os.getenv('BOT_HTTP_TOKEN_NEW')
     BOT_HTTP_TOKEN_TEST = os.getenv('BOT_HTTP_TOKEN_TEST')
     BARD_API_KEY = os.getenv('BARD_API_KEY')
     GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
     REDIS_URL = os.getenv('REDIS_URL')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_ACCESS_SAMPLE_RATE = float(os.getenv('LOG_ACCESS_SAMPLE_RATE', '1'))
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '8'))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+    DISPATCH_CONCURRENCY = int(os.getenv('DISPATCH_CONCURRENCY', '16'))
+    DISPATCH_PER_CHAT = int(os.getenv('DISPATCH_PER_CHAT', '50'))
 
 # 配置实例
 config = Config()
\ No newline at end of file
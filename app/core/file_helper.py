@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import AsyncIterable
 
 
 class FileHelper:
@@ -21,5 +22,21 @@ class FileHelper:
         file_path.write_bytes(content)
 
         return str(file_path)
+
+    async def save_stream(self, name: str, chunks: AsyncIterable[bytes]) -> str:
+        file_path = self.base_dir / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件，完整下载后再替换，避免中断时留下半个文件
+        tmp_path = file_path.with_name(file_path.name + '.part')
+        try:
+            with tmp_path.open('wb') as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+            tmp_path.replace(file_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        return str(file_path)
     
 file_manager = FileHelper()
\ No newline at end of file
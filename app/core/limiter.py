@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """拿到下一个令牌还需等待的秒数"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """不等待：有令牌时取走并返回 0，否则返回还需等待的秒数"""
+        wait = self.delay()
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    async def acquire(self):
+        # 加锁保证先到先得，排队的请求按到达顺序依次拿令牌
+        async with self._lock:
+            while (wait := self.delay()) > 0:
+                await asyncio.sleep(wait)
+            self.tokens -= 1
+
+
+class HostLimiter:
+    """单个 host 的限流器：最大并发数 + 令牌桶，记录排队和进行中的请求数"""
+
+    def __init__(self, max_in_flight: Optional[int] = None, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.max_in_flight = max_in_flight
+        self.semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.waiting = 0
+        self.in_flight = 0
+
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            if self.semaphore:
+                await self.semaphore.acquire()
+            try:
+                if self.bucket:
+                    await self.bucket.acquire()
+            except BaseException:
+                if self.semaphore:
+                    self.semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        if self.semaphore:
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            'max_in_flight': self.max_in_flight,
+            'rate': self.bucket.rate if self.bucket else None,
+            'waiting': self.waiting,
+            'in_flight': self.in_flight,
+        }
@@ -0,0 +1,113 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import queue
+from typing import Optional, Union
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    非阻塞的 QueueHandler：队列满时直接丢弃并计数，事件循环线程永远不会被日志 I/O 卡住
+    记录原样入队，格式化交给 QueueListener 所在线程
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 进程内队列无需 pickle，跳过 QueueHandler 默认的提前格式化
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """停止时阻塞等待队列腾出位置放入结束标记，保证队列满时也能正常退出并写完剩余日志"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SamplingFilter(logging.Filter):
+    """按比例采样 INFO 及以下的日志，WARNING 及以上始终保留"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(
+    level: Union[int, str] = logging.INFO,
+    queue_size: int = 10000,
+    handlers: Optional[list] = None,
+    access_sample_rate: float = 1.0,
+) -> logging.Logger:
+    """
+    把 root logger 切换到 队列 + 后台线程 的模式，可重复调用
+    :param handlers: 实际输出的 handler，默认输出到控制台
+    :param access_sample_rate: 访问日志（core.middleware）的采样比例
+    """
+    global _handler, _listener
+    root = logging.getLogger()
+    if _listener is None:
+        if not handlers:
+            handlers = [logging.StreamHandler()]
+        formatter = logging.Formatter(LOG_FORMAT)
+        for handler in handlers:
+            if handler.formatter is None:
+                handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        _handler = DroppingQueueHandler(log_queue)
+        _listener = DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        # 替换掉 basicConfig 等装上的同步 handler
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+
+    root.setLevel(level)
+    access_logger = logging.getLogger('core.middleware')
+    for old in [f for f in access_logger.filters if isinstance(f, SamplingFilter)]:
+        access_logger.removeFilter(old)
+    if access_sample_rate < 1:
+        access_logger.addFilter(SamplingFilter(access_sample_rate))
+    return root
+
+
+def stop_logging():
+    """停止后台线程并把队列中剩余的日志写完"""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+
+def log_stats() -> dict:
+    if _handler is None:
+        return {'enabled': False}
+    return {'enabled': True, 'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
@@ -1,23 +1,106 @@
-from fastapi import Request
 import logging
-from datetime import datetime
+from array import array
+from time import perf_counter_ns
+from typing import Dict
 
 
-# 设置日志记录
-logging.basicConfig(level=logging.INFO)
+# 访问日志，输出和采样由 core.log.setup_logging 统一配置
 logger = logging.getLogger(__name__)
 
-async def middleware(request: Request, call_next):
-    start_time = datetime.now()
-    response = await call_next(request)
-    end_time = datetime.now()
-    info = {
-        'interface': request.scope["path"],
-        'status_code': response.status_code,
-        'source_ip': request.client.host,
-         start_time.strftime('%Y-%m-%d %H:%M:%S'): f'{(end_time - start_time).total_seconds()*1000:.2f}(ms)'
-    }
-
-    logger.info('-'.join([f"[{key}:{val}]" for key, val in info.items()]))
-    
-    return response
\ No newline at end of file
+
+class LatencyWindow:
+    """固定大小的环形缓冲区，只在事件循环线程内写入，无需加锁"""
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.samples = array('d', [0.0]) * size
+        self.index = 0
+
+    def add(self, ms: float):
+        self.samples[self.index % self.size] = ms
+        self.index += 1
+
+    def snapshot(self) -> dict:
+        count = min(self.index, self.size)
+        data = sorted(self.samples[:count])
+        if not data:
+            return {'count': 0}
+
+        def pick(q: float) -> float:
+            return round(data[min(count - 1, int(q * count))], 2)
+
+        return {
+            'count': self.index,
+            'window': count,
+            'p50': pick(0.50),
+            'p95': pick(0.95),
+            'p99': pick(0.99),
+            'max': round(data[-1], 2),
+        }
+
+
+class LatencyStats:
+    """按路由模板聚合耗时，路由数量有上限，避免扫描器请求的随机路径撑爆内存"""
+
+    def __init__(self, window: int = 1024, max_routes: int = 256):
+        self.window = window
+        self.max_routes = max_routes
+        self.routes: Dict[str, LatencyWindow] = {}
+
+    def record(self, route: str, ms: float):
+        samples = self.routes.get(route)
+        if samples is None:
+            if len(self.routes) >= self.max_routes:
+                route = '<other>'
+                samples = self.routes.get(route)
+            if samples is None:
+                samples = self.routes[route] = LatencyWindow(self.window)
+        samples.add(ms)
+
+    def snapshot(self) -> dict:
+        return {route: samples.snapshot() for route, samples in self.routes.items()}
+
+latency_stats = LatencyStats()
+
+
+class TimingMiddleware:
+    """
+    纯 ASGI 计时中间件：
+        - 响应头中加入 Server-Timing（到发出响应头为止的耗时）
+        - 按路由记录完整耗时（含流式响应体）到 latency_stats
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter_ns()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                duration = (perf_counter_ns() - start) / 1e6
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', f'app;dur={duration:.2f}'.encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = (perf_counter_ns() - start) / 1e6
+            # 路由匹配后 starlette 会把 route 写回 scope，用模板路径聚合
+            route = getattr(scope.get('route'), 'path', scope['path'])
+            latency_stats.record(route, elapsed)
+            client = scope.get('client')
+            logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                '[interface:%s]-[status_code:%s]-[source_ip:%s]-[%.2f(ms)]',
+                scope['path'], status_code, client[0] if client else '-', elapsed,
+            )
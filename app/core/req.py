@@ -1,91 +1,445 @@
 import aiohttp
 import asyncio
+import hashlib
 import json
-from functools import wraps
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+import logging
+import time
+from functools import wraps, cached_property
+from typing import Optional, Dict, Any, AsyncIterator, Mapping, Iterable, Callable, Awaitable
+from dataclasses import dataclass, field
+from multidict import CIMultiDict
+from yarl import URL
 
+from core.file_helper import file_manager
+from core.retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+from core.limiter import HostLimiter
+from core.cache import CacheEntry, MemoryCache
+from core.trace import HttpTracer, tracer as default_tracer
+
+logger = logging.getLogger(__name__)
+
+# 可以安全合并的幂等请求方法
+COALESCE_METHODS = ('GET', 'HEAD')
+# 会改变请求身份或结果的参数，带了这些参数的请求不合并也不缓存，避免把一个调用方的响应交给另一个
+UNSHARED_KWARGS = ('data', 'json', 'auth', 'cookies', 'proxy', 'proxy_auth', 'allow_redirects', 'max_redirects', 'ssl', 'verify_ssl', 'server_hostname')
 
 @dataclass
 class HttpResponse:
     url: str
     status_code: int
     headers: Dict[str, str]
-    body: Optional[str] = None
     content: Optional[bytes] = None
+    encoding: Optional[str] = None
     error: Optional[str] = None
+    response_headers: CIMultiDict = field(default_factory=CIMultiDict)
+
+    @cached_property
+    def body(self) -> Optional[str]:
+        """首次访问时才解码，避免 bytes 和 str 同时常驻内存"""
+        if self.content is None:
+            return None
+        try:
+            return self.content.decode(self.encoding or "utf-8")
+        except Exception:
+            return None
 
     @property
     def text(self) -> str:
         return self.body or ""
 
     def json(self) -> Dict[str, Any]:
-        if not self.body:
+        if not self.content:
             return {"error": "Empty response"}
+        # UTF-8（或未声明编码）时 json.loads 直接解析 bytes，无需先解码成 body；
+        # 其他编码（如 GBK）按声明的编码解码后再解析
+        utf8 = (self.encoding or 'utf-8').lower().replace('_', '-') in ('utf-8', 'utf8')
         try:
-            return json.loads(self.body)
-        except json.JSONDecodeError:
+            return json.loads(self.content if utf8 else self.body)
+        except (TypeError, json.JSONDecodeError, UnicodeDecodeError):
             return {"error": "JSON parse error", "body": self.body}
 
 
+@dataclass
+class BatchResult:
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def iter_completed(items: Iterable, func: Callable[[Any], Awaitable], concurrency: int = 10) -> AsyncIterator[BatchResult]:
+    """
+    对 items 逐个调用 func，最多 concurrency 个同时运行，按完成顺序返回 BatchResult
+    单个失败只记录在对应结果的 error 中，不影响其他任务；中途退出迭代会取消未完成的任务
+    """
+    iterator = enumerate(items)
+    pending: Dict[asyncio.Future, tuple] = {}
+
+    def launch():
+        while len(pending) < concurrency:
+            try:
+                index, item = next(iterator)
+            except StopIteration:
+                return
+            pending[asyncio.ensure_future(func(item))] = (index, item)
+
+    try:
+        launch()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, item = pending.pop(task)
+                if task.cancelled():
+                    yield BatchResult(index, item, error=asyncio.CancelledError())
+                elif task.exception() is not None:
+                    yield BatchResult(index, item, error=task.exception())
+                else:
+                    yield BatchResult(index, item, result=task.result())
+            launch()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
 # 定义重试装饰器
-def retry(retries: int = 3, backoff_factor: float = 1.0, status_forcelist=None):
-    if status_forcelist is None:
-        status_forcelist = [429, 500, 502, 503, 504]
-    
+def retry(retries: int = 3, backoff_factor: float = 1.0, status_forcelist=None, max_backoff: float = 30.0, deadline: Optional[float] = None):
+    """
+    异常和 status_forcelist 中的状态码都会触发重试，等待时间优先取 Retry-After，
+    否则使用 full jitter 退避；deadline 为整个调用的总预算，预算不够下一次重试时立即返回/抛出。
+    状态码重试只对 policy.status_methods 中的方法生效（被装饰函数的第一个参数为请求方法），
+    POST 等非幂等请求需要通过 retry_policy=RetryPolicy(status_methods=None) 显式开启。
+    调用时可通过 retry_policy=RetryPolicy(...) 或 deadline=秒 覆盖默认策略
+    """
+    default_policy = RetryPolicy(
+        retries=retries,
+        backoff_factor=backoff_factor,
+        max_backoff=max_backoff,
+        status_forcelist=tuple(status_forcelist or RetryPolicy.status_forcelist),
+        deadline=deadline,
+    )
+
     def decorator(func):
         @wraps(func)
-        async def wrapper(self, *args, **kwargs):
+        async def wrapper(self, *args, retry_policy: Optional[RetryPolicy] = None, deadline: Optional[float] = None, **kwargs):
+            policy = retry_policy or default_policy
+            budget = deadline if deadline is not None else policy.deadline
+            give_up_at = time.monotonic() + budget if budget else None
+            method = args[0] if args else kwargs.get('method')
             attempt = 0
-            while attempt <= retries:
+            while True:
+                call_kwargs = kwargs
+                if give_up_at is not None and 'timeout' not in kwargs:
+                    # 单次请求的超时不能超过剩余预算
+                    remaining = max(give_up_at - time.monotonic(), 0.001)
+                    call_kwargs = {**kwargs, 'timeout': aiohttp.ClientTimeout(total=remaining)}
+                error = None
                 try:
-                    return await func(self, *args, **kwargs)
-                except (aiohttp.ClientError, aiohttp.ServerTimeoutError) as e:
-                    if attempt == retries:
+                    response = await func(self, *args, **call_kwargs)
+                except CircuitOpenError:
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= policy.retries:
                         raise e
-                    attempt += 1
-                    backoff_time = backoff_factor * (2 ** (attempt - 1))
-                    print(f"Retrying request... (Attempt {attempt}/{retries})")
-                    await asyncio.sleep(backoff_time)
+                    error = e
+                    delay = policy.backoff(attempt)
+                else:
+                    if not policy.retry_status(method, response.status_code) or attempt >= policy.retries:
+                        return response
+                    delay = policy.delay_for(attempt, response.response_headers.get('Retry-After'))
+
+                if give_up_at is not None and time.monotonic() + delay >= give_up_at:
+                    # 预算不足以完成下一次重试，直接返回最后一次结果
+                    if error is not None:
+                        raise error
+                    return response
+
+                attempt += 1
+                logger.info("Retrying request... (Attempt %s/%s, wait %.2fs)", attempt, policy.retries, delay)
+                await asyncio.sleep(delay)
         return wrapper
     return decorator
 
 
 class HttpClient:
-    def __init__(self, default_headers: Optional[dict] = None):
+    def __init__(
+        self,
+        default_headers: Optional[dict] = None,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: int = 300,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_in_flight_per_host: Optional[int] = None,
+        rate_per_host: Optional[float] = None,
+        cache=None,
+        tracer: Optional[HttpTracer] = default_tracer,
+    ):
         self.default_headers = default_headers or {}
+        self.connector_options = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': dns_cache_ttl,
+        }
+        self.breaker_options = {
+            'failure_threshold': failure_threshold,
+            'reset_timeout': reset_timeout,
+        }
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # 未单独配置的 host 使用默认限流参数，None 表示不限制
+        self.default_host_limit = {'max_in_flight': max_in_flight_per_host, 'rate': rate_per_host}
+        self.host_limits: Dict[str, dict] = {}
+        self.limiters: Dict[str, HostLimiter] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # 响应缓存后端，只对传了 cache_ttl 的请求生效，可替换为 core.cache.RedisCache()
+        self.cache = cache if cache is not None else MemoryCache()
+        # 连接阶段耗时统计，传 None 关闭
+        self.tracer = tracer
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> aiohttp.ClientSession:
+        """创建（或复用）共享的连接池会话，应在 lifespan / 入口函数中调用"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # 会话绑定创建时的事件循环，换了循环（如多次 asyncio.run）就重新建
+            connector = aiohttp.TCPConnector(**self.connector_options)
+            trace_configs = [self.tracer.trace_config()] if self.tracer else None
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs)
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        """关闭共享会话，释放连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """按 host 获取熔断器"""
+        host = URL(url).host or ''
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(**self.breaker_options)
+        return self.breakers[host]
+
+    def set_host_limit(self, host: str, max_in_flight: Optional[int] = None, rate: Optional[float] = None, burst: Optional[int] = None):
+        """配置某个 host 的最大并发数和每秒请求数"""
+        self.host_limits[host] = {'max_in_flight': max_in_flight, 'rate': rate, 'burst': burst}
+        self.limiters.pop(host, None)
+
+    def limiter(self, url: str) -> HostLimiter:
+        """按 host 获取限流器"""
+        host = URL(url).host or ''
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(**self.host_limits.get(host, self.default_host_limit))
+        return self.limiters[host]
+
+    def queue_depth(self, host: Optional[str] = None):
+        """排队等待发送的请求数，不传 host 时返回所有 host 的统计"""
+        if host is not None:
+            limiter = self.limiters.get(host)
+            return limiter.waiting if limiter else 0
+        return {host: limiter.stats() for host, limiter in self.limiters.items()}
+
+    def _check_breaker(self, url: str) -> CircuitBreaker:
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(URL(url).host or '', breaker.retry_in)
+        return breaker
 
     async def _send(self, method: str, url: str, headers: Optional[dict] = None, **kwargs) -> HttpResponse:
+        """发送一次请求，熔断器由 _request 按整个调用（含重试）计数"""
         # 合并传入的 headers 和默认的 headers
         headers = {**self.default_headers, **(headers or {})}
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.request(method, url, headers=headers, **kwargs) as response:
-                    content = await response.read()
-                    try:
-                        body = content.decode(response.charset or "utf-8")
-                    except Exception:
-                        body = None
-                        
-                    return HttpResponse(
-                        url=str(response.real_url),
-                        status_code=response.status,
-                        headers=dict(response.request_info.headers),
-                        body=body,
-                        content=content,
-                    )
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                print(f"[{url}] params={kwargs.get('params')} -> (error={e})")
-                raise e
+
+        # 未经 lifespan 启动时按需创建，调用方无需关心
+        session = await self.start()
+        timings = {}
+        try:
+            async with self.limiter(url), session.request(method, url, headers=headers, trace_request_ctx=timings, **kwargs) as response:
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("[%s] params=%s -> (error=%s)", url, kwargs.get('params'), e)
+            raise e
+
+        if self.tracer:
+            self.tracer.record(response.url.host or '', timings)
+
+        return HttpResponse(
+            url=str(response.real_url),
+            status_code=response.status,
+            headers=dict(response.request_info.headers),
+            content=content,
+            encoding=response.charset,
+            response_headers=CIMultiDict(response.headers),
+        )
+
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[dict] = None,
+        chunk_size: int = 64 * 1024,
+        **kwargs,
+    ) -> AsyncIterator[bytes]:
+        """
+        流式读取响应体，按 chunk_size 逐块返回，内存占用与响应大小无关
+        非 2xx 状态码会抛出 aiohttp.ClientResponseError
+        """
+        headers = {**self.default_headers, **(headers or {})}
+        session = await self.start()
+        breaker = self._check_breaker(url)
+        timings = {}
+        try:
+            async with self.limiter(url), session.request(method, url, headers=headers, trace_request_ctx=timings, **kwargs) as response:
+                if response.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+            if self.tracer:
+                self.tracer.record(response.url.host or '', timings)
+        except aiohttp.ClientResponseError as e:
+            # 状态码已经计入熔断器
+            logger.warning("[%s] params=%s -> (error=%s)", url, kwargs.get('params'), e)
+            raise e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            logger.warning("[%s] params=%s -> (error=%s)", url, kwargs.get('params'), e)
+            raise e
+
+    async def download(self, url: str, name: str, headers: Optional[dict] = None, **kwargs) -> str:
+        """流式下载到 file_manager 目录下的 name，返回保存路径"""
+        chunks = self.stream('GET', url, headers=headers, **kwargs)
+        return await file_manager.save_stream(name, chunks)
 
     @retry()  # 添加重试装饰器
-    async def request(self, method: str, url: str, headers: Optional[dict] = None, **kwargs) -> HttpResponse:
+    async def _send_with_retry(self, method: str, url: str, headers: Optional[dict] = None, **kwargs) -> HttpResponse:
+        return await self._send(method, url, headers=headers, **kwargs)
+
+    async def _request(self, method: str, url: str, headers: Optional[dict] = None, **kwargs) -> HttpResponse:
+        """
+        一次逻辑调用只检查、记录一次熔断器：重试过程中的失败不单独计数，
+        以最后一次的结果为准，避免单个请求的几次重试就把熔断器打开
+        """
+        breaker = self._check_breaker(url)
+        try:
+            response = await self._send_with_retry(method, url, headers=headers, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _coalesce_key(self, method: str, url: str, headers: Optional[dict], kwargs: dict) -> Optional[tuple]:
+        """幂等且不带请求体、认证等参数的请求才能合并（缓存也用这个键），返回 None 表示不合并"""
+        if method.upper() not in COALESCE_METHODS or any(k in kwargs for k in UNSHARED_KWARGS):
+            return None
+        params = kwargs.get('params')
+        if isinstance(params, Mapping):
+            params = tuple(sorted((str(k), str(v)) for k, v in params.items()))
+        elif params is not None and not isinstance(params, str):
+            params = tuple(params)
+        merged = {**self.default_headers, **(headers or {})}
+        headers_key = tuple(sorted((k.lower(), str(v)) for k, v in merged.items()))
+        return (method.upper(), url, params, headers_key)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[dict] = None,
+        coalesce: bool = True,
+        cache_ttl: Optional[float] = None,
+        **kwargs,
+    ) -> HttpResponse:
         """
         请求方法，支持 GET、POST、HEAD、DELETE
+        并发的相同 GET/HEAD 请求只发一次上游请求，所有调用方共享同一个 HttpResponse（不要修改它）
+        cache_ttl 大于 0 时启用响应缓存，过期后带 ETag/Last-Modified 做条件请求
         """
-        response = await self._send(method, url, headers=headers, **kwargs)
-        return response  # 返回 JSON 数据，其他类型的响应可以自行处理
+        if cache_ttl and method.upper() == 'GET':
+            key = self._coalesce_key(method, url, headers, kwargs)
+            if key is not None:
+                return await self._cached_request(key, url, headers, cache_ttl, coalesce, **kwargs)
+        return await self._coalesced_request(method, url, headers, coalesce, **kwargs)
+
+    async def _cached_request(self, key: tuple, url: str, headers: Optional[dict], cache_ttl: float, coalesce: bool, **kwargs) -> HttpResponse:
+        cache_key = hashlib.sha1(repr(key).encode()).hexdigest()
+        entry = await self.cache.get(cache_key)
+        if entry is not None and entry.fresh:
+            return self._from_cache(entry)
+
+        if entry is not None and entry.revalidatable:
+            conditional = {}
+            if entry.etag:
+                conditional['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                conditional['If-Modified-Since'] = entry.last_modified
+            headers = {**(headers or {}), **conditional}
+
+        response = await self._coalesced_request('GET', url, headers, coalesce, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            # 内容未变化，只刷新过期时间
+            entry.expires_at = time.time() + cache_ttl
+            await self.cache.set(cache_key, entry)
+            return self._from_cache(entry)
+
+        if response.status_code == 200:
+            await self.cache.set(cache_key, CacheEntry(
+                url=response.url,
+                status_code=response.status_code,
+                headers=response.headers,
+                content=response.content,
+                encoding=response.encoding,
+                response_headers=dict(response.response_headers),
+                expires_at=time.time() + cache_ttl,
+                etag=response.response_headers.get('ETag'),
+                last_modified=response.response_headers.get('Last-Modified'),
+            ))
+        return response
+
+    @staticmethod
+    def _from_cache(entry: CacheEntry) -> HttpResponse:
+        return HttpResponse(
+            url=entry.url,
+            status_code=entry.status_code,
+            headers=entry.headers,
+            content=entry.content,
+            encoding=entry.encoding,
+            response_headers=CIMultiDict(entry.response_headers),
+        )
+
+    async def _coalesced_request(self, method: str, url: str, headers: Optional[dict], coalesce: bool, **kwargs) -> HttpResponse:
+        key = self._coalesce_key(method, url, headers, kwargs) if coalesce else None
+        if key is None:
+            return await self._request(method, url, headers=headers, **kwargs)
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 请求放在独立 task 中执行，发起方被取消也不会影响其他等待者
+            task = asyncio.ensure_future(self._request(method, url, headers=headers, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release_inflight(key, t))
+        return await asyncio.shield(task)
+
+    def _release_inflight(self, key: tuple, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
 
     async def get(self, url: str, headers: Optional[dict] = None, **kwargs) -> HttpResponse:
         """发起 GET 请求"""
@@ -103,4 +457,17 @@ class HttpClient:
         """发起 DELETE 请求"""
         return await self.request('DELETE', url, headers=headers, **kwargs)
 
+    def fetch_many(self, requests: Iterable, concurrency: int = 10) -> AsyncIterator[BatchResult]:
+        """
+        批量请求，按完成顺序返回 BatchResult(index, item, result=HttpResponse, error)
+        requests 中每一项可以是 url 字符串，或 {'method': 'GET', 'url': ..., 其他 request 参数} 的 dict
+        """
+        return iter_completed(requests, self._fetch_one, concurrency)
+
+    async def _fetch_one(self, item) -> HttpResponse:
+        if isinstance(item, str):
+            return await self.request('GET', item)
+        options = dict(item)
+        return await self.request(options.pop('method', 'GET'), options.pop('url'), **options)
+
 http_client = HttpClient()
\ No newline at end of file
@@ -0,0 +1,105 @@
+import aiohttp
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头，支持秒数和 HTTP-date 两种格式，返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    retries: int = 3
+    backoff_factor: float = 1.0
+    max_backoff: float = 30.0
+    status_forcelist: tuple = (429, 500, 502, 503, 504)
+    deadline: Optional[float] = None  # 整个调用（含所有重试）的总耗时预算，秒
+    respect_retry_after: bool = True
+    # 按状态码重试只对这些幂等方法生效，POST 等需要调用方显式传入；None 表示所有方法
+    status_methods: Optional[tuple] = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def retry_status(self, method: Optional[str], status_code: int) -> bool:
+        if status_code not in self.status_forcelist:
+            return False
+        return self.status_methods is None or (method or '').upper() in self.status_methods
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter：在 [0, min(max_backoff, factor * 2^attempt)] 之间随机取值"""
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def delay_for(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """优先使用服务端给出的 Retry-After，否则退回 jitter 退避"""
+        if self.respect_retry_after:
+            hinted = parse_retry_after(retry_after)
+            if hinted is not None:
+                return min(hinted, self.max_backoff)
+        return self.backoff(attempt)
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """熔断器打开时直接失败，不再请求上游"""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"circuit open for {host}, retry in {retry_in:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    单个 host 的熔断器：
+        closed    正常放行，连续失败达到阈值后进入 open
+        open      直接拒绝，reset_timeout 之后进入 half_open
+        half_open 每个 reset_timeout 周期只放行一个探测请求，成功则 closed，失败则重新 open
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.retry_in > 0:
+            return False
+        # 冷却结束，放行一个探测请求，并重新计时，探测挂起时也不会放行第二个
+        self.state = self.HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
@@ -0,0 +1,44 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+# 模块名 -> 导入（含注册）耗时，毫秒；嵌套计时的模块耗时也计入外层
+import_times: dict[str, float] = {}
+_total = 0.0
+_depth = 0
+
+
+@contextmanager
+def timed(name: str):
+    global _total, _depth
+    started = time.perf_counter()
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth -= 1
+        elapsed = (time.perf_counter() - started) * 1000
+        import_times[name] = round(elapsed, 1)
+        if _depth == 0:
+            _total += elapsed
+
+
+def import_module(name: str) -> ModuleType:
+    """importlib.import_module 并记录耗时，已导入过的模块耗时接近 0"""
+    with timed(name):
+        return importlib.import_module(name)
+
+
+def report(top: int = 10) -> dict:
+    """启动导入耗时报告，按耗时倒序"""
+    items = sorted(import_times.items(), key=lambda item: item[1], reverse=True)
+    return {'total_ms': round(_total, 1), 'modules': dict(items[:top] if top else items)}
+
+
+def log_report(top: int = 5):
+    data = report(top)
+    logger.info('startup imports %.1fms, slowest: %s', data['total_ms'], ', '.join(f'{k}={v}ms' for k, v in data['modules'].items()))
@@ -0,0 +1,114 @@
+import aiohttp
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+# 直方图桶上界（毫秒），最后一个桶为 +inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# connect 包含 TLS 握手，aiohttp 没有单独的 TLS 钩子
+PHASES = ('dns', 'connect', 'ttfb', 'transfer', 'total')
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶估算分位数，返回所在桶的上界"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        labels = [f'<={b}' for b in BUCKETS_MS] + ['+inf']
+        return {
+            'count': self.count,
+            'avg': round(self.sum / self.count, 2) if self.count else None,
+            'max': round(self.max, 2),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class HttpTracer:
+    """通过 aiohttp TraceConfig 记录每个请求各阶段耗时，并按 host 聚合成直方图"""
+
+    def __init__(self):
+        self.hosts: Dict[str, Dict[str, Histogram]] = {}
+        self.reused: Dict[str, int] = {}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        config = aiohttp.TraceConfig()
+
+        def mark(name):
+            async def hook(session, ctx, params):
+                timings = ctx.trace_request_ctx
+                if timings is not None:
+                    timings[name] = time.perf_counter()
+            return hook
+
+        async def on_reuse(session, ctx, params):
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx['reused'] = True
+
+        config.on_request_start.append(mark('start'))
+        config.on_dns_resolvehost_start.append(mark('dns_start'))
+        config.on_dns_resolvehost_end.append(mark('dns_end'))
+        config.on_connection_create_start.append(mark('connect_start'))
+        config.on_connection_create_end.append(mark('connect_end'))
+        config.on_connection_reuseconn.append(on_reuse)
+        config.on_request_headers_sent.append(mark('sent'))
+        config.on_request_end.append(mark('headers'))
+        return config
+
+    def record(self, host: str, timings: dict):
+        """请求体读取完成后调用，timings 为传给 trace_request_ctx 的 dict"""
+        if 'start' not in timings or 'headers' not in timings:
+            return
+        timings.setdefault('done', time.perf_counter())
+        phases = {
+            'dns': (timings.get('dns_start'), timings.get('dns_end')),
+            'connect': (timings.get('connect_start'), timings.get('connect_end')),
+            'ttfb': (timings.get('sent', timings['start']), timings['headers']),
+            'transfer': (timings['headers'], timings['done']),
+            'total': (timings['start'], timings['done']),
+        }
+        histograms = self.hosts.setdefault(host, {phase: Histogram() for phase in PHASES})
+        for phase, (begin, end) in phases.items():
+            if begin is not None and end is not None:
+                histograms[phase].observe((end - begin) * 1000)
+        if timings.get('reused'):
+            self.reused[host] = self.reused.get(host, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {
+            host: {
+                'reused_connections': self.reused.get(host, 0),
+                **{phase: histogram.snapshot() for phase, histogram in histograms.items()},
+            }
+            for host, histograms in self.hosts.items()
+        }
+
+    def reset(self):
+        self.hosts.clear()
+        self.reused.clear()
+
+
+tracer = HttpTracer()
@@ -0,0 +1,113 @@
+"""
+KV 值的编码层
+
+编码后的值以一个头字节开头（取值 < 0x10），低 2 位表示序列化方式，3-4 位表示压缩方式：
+    serializer: 0 原始文本  1 JSON  2 msgpack  3 bytes
+    compressor: 0 不压缩    1 zlib  2 zstd
+没有头字节的旧值按原始 UTF-8 文本读出；以控制字符开头的新文本会加上 0x00 头，保证可以无歧义地还原
+旧值也可能以 \n、\t 等控制字符开头，首字节不是合法的头、或按头解压/解析失败时同样按原始文本读出
+"""
+import json
+import zlib
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RAW, JSON, MSGPACK, BYTES = 0, 1, 2, 3
+NONE, ZLIB, ZSTD = 0, 1, 2
+HEADER_LIMIT = 0x10
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# 超过该字节数才压缩，小值压缩收益不抵头部和 CPU 开销
+COMPRESS_THRESHOLD = 1024
+
+
+def _serialize(value: Any, serializer: Optional[str]) -> tuple[int, bytes]:
+    if isinstance(value, (bytes, bytearray)) and serializer is None:
+        return BYTES, bytes(value)
+    if isinstance(value, str) and serializer is None:
+        return RAW, value.encode('utf-8')
+    if serializer == 'msgpack' and msgpack is not None:
+        return MSGPACK, msgpack.packb(value, use_bin_type=True)
+    return JSON, json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(data: bytes, compression: str) -> tuple[int, bytes]:
+    if compression == 'zstd' and zstandard is not None:
+        return ZSTD, zstandard.ZstdCompressor(level=3).compress(data)
+    return ZLIB, zlib.compress(data, 6)
+
+
+def encode(value: Any, serializer: Optional[str] = None, compression: str = 'zlib', threshold: int = COMPRESS_THRESHOLD) -> bytes:
+    """
+    str/bytes 默认原样存储（bytes 带头字节，读出时仍是 bytes），其他对象用 JSON（serializer='msgpack' 且已安装时用 msgpack）
+    序列化后超过 threshold 字节时压缩，压缩后没有变小则保留原文
+    """
+    kind, data = _serialize(value, serializer)
+    compressor = NONE
+    if threshold is not None and len(data) > threshold:
+        compressed_kind, compressed = _compress(data, compression)
+        if len(compressed) < len(data):
+            compressor, data = compressed_kind, compressed
+
+    if kind == RAW and compressor == NONE:
+        # 保持旧格式：普通文本不加头
+        return b'\x00' + data if data[:1] and data[0] < HEADER_LIMIT else data
+    return bytes([kind | (compressor << 2)]) + data
+
+
+def _text(data: bytes) -> str:
+    return data.decode('utf-8', errors='replace')
+
+
+def _decode_payload(kind: int, compressor: int, payload: bytes) -> Any:
+    if compressor == ZLIB:
+        payload = zlib.decompress(payload)
+    elif compressor == ZSTD:
+        if not payload.startswith(ZSTD_MAGIC):
+            raise ValueError('not a zstd frame')
+        if zstandard is None:
+            raise RuntimeError('value is zstd compressed but zstandard is not installed')
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+
+    if kind == JSON:
+        return json.loads(payload)
+    if kind == MSGPACK:
+        if msgpack is None:
+            # 无法确认是 msgpack 还是 \x02 开头的旧文本，按文本处理
+            raise ValueError('msgpack is not installed')
+        return msgpack.unpackb(payload, raw=False)
+    if kind == BYTES:
+        return payload
+    return payload.decode('utf-8')
+
+
+def decode(data: Optional[bytes]) -> Any:
+    """还原 encode 的结果，没有合法头字节或按头解析失败的旧值按 UTF-8 文本返回"""
+    if data is None:
+        return None
+    if not data or data[0] >= HEADER_LIMIT:
+        return _text(data)
+
+    header = data[0]
+    kind, compressor = header & 0b11, (header >> 2) & 0b11
+    if compressor not in (NONE, ZLIB, ZSTD):
+        return _text(data)
+    if kind == RAW and compressor == NONE:
+        # 0x00 是 encode 给控制字符开头的文本加的转义头
+        return _text(data[1:])
+    try:
+        return _decode_payload(kind, compressor, data[1:])
+    except RuntimeError:
+        # 带 zstd 帧头，确实是新格式但缺少 zstandard，不能当成文本吞掉
+        raise
+    except Exception:
+        return _text(data)
@@ -1,24 +1,177 @@
+import asyncio
+import hashlib
+import json
+import time
 import redis
+import redis.asyncio as aioredis
+from collections import OrderedDict
 from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from core.config import config
+from databases.notify import KeyspaceNotifier
+from databases.scan import KeyspaceReport, scan_keyspace
+from databases.watch import KeyWatcher
+from databases import codec
+
+_MISSING = object()
+
+class LocalCache:
+    """进程内 TTL + LRU 读缓存，由 keyspace 通知负责失效"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._loading: dict = {}
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def begin(self, key: str) -> object:
+        """读 Redis 前登记，读取期间 key 被失效则本次结果不写入缓存"""
+        token = object()
+        self._loading[key] = token
+        return token
+
+    def put(self, key: str, value, token: object):
+        if self._loading.get(key) is not token:
+            return
+        del self._loading[key]
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._data.pop(key, None)
+        self._loading.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._loading.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
 
 class KV:
-    def __init__(self):
+    def __init__(self, max_connections: int = 32, pool_timeout: float = 5):
         self._r = None
+        self._rb = None
+        self._clients = {}
+        self._loop = None
+        # 本地读缓存只在 keyspace 订阅正常时启用，保证其他进程的写入能及时失效本地副本
+        self.local = LocalCache()
+        self.notifier = KeyspaceNotifier(self)
+        self.notifier.subscribe(lambda key, event: self.local.invalidate(key))
+        self.notifier.on_reset(self.local.clear)
+        self.watcher = KeyWatcher(self.notifier)
+        self.pool_options = {
+            'max_connections': max_connections,
+            'timeout': pool_timeout,  # 连接池耗尽时最多等待的秒数
+            'socket_connect_timeout': 5,
+            'socket_keepalive': True,
+            'health_check_interval': 30,
+        }
 
     @property
     def redis(self):
+        """同步客户端，只用于脚本和非 async 代码"""
         if self._r is None:
             self._r = redis.Redis.from_url(config.REDIS_URL, decode_responses=True)
         return self._r
-    
-    def print(self):
-        keys = self.redis.keys("*")  # 获取所有以 "news:" 开头的 key
-        for key in keys:
-            ttl = self.redis.ttl(key)  # 获取 key 的剩余有效时间（秒）
-            print(f"Key: {key}, TTL: {ttl} seconds")
-            break
-        print("Total keys: ", len(keys))
+
+    @property
+    def binary(self):
+        """同步二进制客户端，读写经过 codec 编码的值"""
+        if self._rb is None:
+            self._rb = redis.Redis.from_url(config.REDIS_URL, decode_responses=False)
+        return self._rb
+
+    def _async_client(self, decode_responses: bool) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 连接池绑定事件循环，换了循环就重新建
+            self._clients = {}
+            self._loop = loop
+        if decode_responses not in self._clients:
+            pool = aioredis.BlockingConnectionPool.from_url(config.REDIS_URL, decode_responses=decode_responses, **self.pool_options)
+            self._clients[decode_responses] = aioredis.Redis(connection_pool=pool)
+        return self._clients[decode_responses]
+
+    @property
+    def aredis(self) -> aioredis.Redis:
+        """异步客户端，async 代码中使用，不会阻塞事件循环"""
+        return self._async_client(True)
+
+    @property
+    def abinary(self) -> aioredis.Redis:
+        """异步二进制客户端，读写经过 codec 编码的值"""
+        return self._async_client(False)
+
+    async def start(self):
+        """启动 keyspace 订阅，启用本地读缓存"""
+        await self.notifier.start()
+
+    async def close(self):
+        await self.notifier.stop()
+        self.local.clear()
+        for client in self._clients.values():
+            await client.aclose()
+            await client.connection_pool.disconnect()
+        self._clients = {}
+        self._loop = None
+
+    async def get(self, key: str, cache: bool = True):
+        """
+        读取 key 并按 codec 解码（兼容未编码的旧值）
+        cache=True 且订阅正常时优先走本地缓存
+        """
+        if not (cache and self.notifier.active):
+            return codec.decode(await self.abinary.get(key))
+        value = self.local.get(key)
+        if value is _MISSING:
+            token = self.local.begin(key)
+            value = codec.decode(await self.abinary.get(key))
+            self.local.put(key, value, token)
+        return value
+
+    async def set(self, key: str, value, ex: int = None, serializer: str = None):
+        """写入 key，非字符串按 JSON/msgpack 序列化，大值自动压缩"""
+        self.local.invalidate(key)
+        return await self.abinary.set(key, codec.encode(value, serializer), ex=ex)
+
+    def get_sync(self, key: str, cache: bool = True):
+        """同步代码使用的 get，同样共享本地缓存"""
+        if not (cache and self.notifier.active):
+            return codec.decode(self.binary.get(key))
+        value = self.local.get(key)
+        if value is _MISSING:
+            token = self.local.begin(key)
+            value = codec.decode(self.binary.get(key))
+            self.local.put(key, value, token)
+        return value
+
+    def set_sync(self, key: str, value, ex: int = None, serializer: str = None):
+        self.local.invalidate(key)
+        return self.binary.set(key, codec.encode(value, serializer), ex=ex)
+
+    def print(self, match: str = "*"):
+        # SCAN 分批遍历，不会像 KEYS * 一样阻塞 Redis
+        total = 0
+        for key in self.redis.scan_iter(match=match, count=1000):
+            if total == 0:
+                ttl = self.redis.ttl(key)  # 获取 key 的剩余有效时间（秒）
+                print(f"Key: {key}, TTL: {ttl} seconds")
+            total += 1
+        print("Total keys: ", total)
     
     def flush_db(self):
         self.redis.flushdb()
@@ -26,6 +179,14 @@ class KV:
 kv = KV()
 router = APIRouter()
 
+DEFAULT_TTL = 60 * 60 * 24 * 7
+
+def parse_ttl(ttl) -> int:
+    try:
+        return int(ttl) if ttl is not None else DEFAULT_TTL
+    except Exception:
+        return DEFAULT_TTL
+
 @router.post("/kv-set")
 async def kv_set(request: Request):
     form = await request.form()
@@ -36,12 +197,8 @@ async def kv_set(request: Request):
     if not key or value is None:
         return {"error": "missing key or value parameter"}
 
-    try:
-        ttl = int(ttl) if ttl is not None else 60 * 60 * 24 * 7
-    except Exception:
-        ttl = 60 * 60 * 24 * 7
-
-    kv.redis.set(key, value, ex=ttl)
+    ttl = parse_ttl(ttl)
+    await kv.set(key, value, ex=ttl)
 
     return {
         "key": key,
@@ -56,4 +213,149 @@ async def kv_get(request: Request):
     if not key:
         return {"error": "missing key parameter"}
 
-    return kv.redis.get(key)
\ No newline at end of file
+    return await kv.get(key)
+
+async def json_list(request: Request, field: str) -> list | None:
+    """批量接口的请求体既可以是 JSON 数组，也可以是 {field: [...]}"""
+    try:
+        data = await request.json()
+    except Exception:
+        return None
+    if isinstance(data, dict):
+        data = data.get(field)
+    return data if isinstance(data, list) else None
+
+WATCH_TIMEOUT = 30
+WATCH_MAX_TIMEOUT = 60
+WATCH_FALLBACK_INTERVAL = 1
+
+def value_version(raw: bytes | None) -> str:
+    """值的版本号（原始字节的摘要），key 不存在时为空字符串"""
+    return hashlib.sha1(raw).hexdigest()[:16] if raw is not None else ''
+
+@router.post("/kv-watch")
+async def kv_watch(request: Request):
+    """
+    长轮询：挂起直到 key 发生变化或超时，替代循环调用 /kv-get
+    参数: key, version 上次拿到的版本号（不传则以当前值为准）, timeout 秒（最大 60）
+    返回: {"key", "changed", "event", "version", "value"}，超时 changed 为 false
+    """
+    form = await request.form()
+    key = form.get('key')
+    if not key:
+        return {"error": "missing key parameter"}
+    try:
+        timeout = min(max(float(form.get('timeout', WATCH_TIMEOUT)), 0), WATCH_MAX_TIMEOUT)
+    except ValueError:
+        return {"error": "timeout must be a number"}
+    known = form.get('version')
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    event = None
+    while True:
+        fut = kv.watcher.register(key)
+        try:
+            raw = await kv.abinary.get(key)
+            version = value_version(raw)
+            if known is None:
+                known = version
+            changed = version != known
+            remaining = deadline - loop.time()
+            if changed or remaining <= 0:
+                return {"key": key, "changed": changed, "event": event if changed else None, "version": version, "value": codec.decode(raw)}
+            if not kv.notifier.active:
+                # 服务端未开启 keyspace 事件或订阅断开时退化为服务端低频轮询，客户端行为不变；
+                # 订阅断开时 notifier 会唤醒正在等待的 watch，让它们立即切到轮询
+                remaining = min(remaining, WATCH_FALLBACK_INTERVAL)
+            # 收到事件后重新读值比对，值没变（例如只改了 TTL）就继续等
+            event = await kv.watcher.wait(key, fut, remaining) or event
+        finally:
+            kv.watcher.discard(key, fut)
+
+@router.post("/kv-mget")
+async def kv_mget(request: Request):
+    """
+    批量读取，一次 MGET
+    请求体: ["k1", "k2"] 或 {"keys": ["k1", "k2"]}
+    """
+    keys = await json_list(request, 'keys')
+    if not keys:
+        return {"error": "missing keys parameter"}
+
+    values = await kv.abinary.mget(keys)
+    return {key: codec.decode(value) for key, value in zip(keys, values)}
+
+@router.post("/kv-mset")
+async def kv_mset(request: Request):
+    """
+    批量写入，一个 pipeline 一次往返
+    请求体: [{"key": "k1", "value": "v1", "ttl": 60}, ["k2", "v2"], ...] 或 {"items": [...]}
+    """
+    items = await json_list(request, 'items')
+    if not items:
+        return {"error": "missing items parameter"}
+
+    entries = []
+    for item in items:
+        if isinstance(item, dict):
+            key, value, ttl = item.get('key'), item.get('value'), item.get('ttl')
+        elif isinstance(item, list) and len(item) in (2, 3):
+            key, value, ttl = (item + [None])[:3]
+        else:
+            return {"error": f"invalid item: {item}"}
+        if not key or value is None:
+            return {"error": f"missing key or value in item: {item}"}
+        entries.append((key, value, parse_ttl(ttl)))
+
+    async with kv.abinary.pipeline(transaction=False) as pipe:
+        for key, value, ttl in entries:
+            kv.local.invalidate(key)
+            pipe.set(key, codec.encode(value), ex=ttl)
+        await pipe.execute()
+
+    return [{"key": key, "ttl": ttl} for key, _, ttl in entries]
+
+@router.post("/kv-del")
+async def kv_del(request: Request):
+    """
+    批量删除
+    请求体: ["k1", "k2"] 或 {"keys": ["k1", "k2"]}
+    """
+    keys = await json_list(request, 'keys')
+    if not keys:
+        return {"error": "missing keys parameter"}
+
+    for key in keys:
+        kv.local.invalidate(key)
+    deleted = await kv.aredis.delete(*keys)
+    return {"deleted": deleted}
+
+@router.post("/kv-scan")
+async def kv_scan(request: Request):
+    """
+    流式（NDJSON）遍历 keyspace，基于 SCAN，不阻塞 Redis
+    参数: match 匹配模式, count 每批数量, sample 每隔多少个 key 抽样一次 MEMORY USAGE,
+         depth 前缀统计按 ':' 分隔的层数, keys=0 时只输出进度和汇总
+    最后一行为 {"summary": {...}}，包含前缀计数、TTL 分布和内存估算
+    """
+    form = await request.form()
+    match = form.get('match') or '*'
+    try:
+        count = int(form.get('count', 500))
+        sample = int(form.get('sample', 100))
+        depth = int(form.get('depth', 1))
+    except ValueError:
+        return {"error": "count, sample and depth must be integers"}
+    list_keys = form.get('keys', '1') != '0'
+
+    async def lines():
+        report = KeyspaceReport(depth)
+        async for item in scan_keyspace(kv.aredis, match, count, sample, depth, report):
+            if list_keys:
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+            elif report.total % 10000 == 0:
+                yield json.dumps({"scanned": report.total}) + '\n'
+        yield json.dumps({"summary": report.summary()}, ensure_ascii=False) + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# K: keyspace 频道, g: DEL/EXPIRE 等通用命令, $: 字符串命令, x: 过期, e: 淘汰
+REQUIRED_EVENTS = 'Kg$xe'
+# 服务端没有开启所需事件时，隔多久重新检查一次（秒）
+RECHECK_INTERVAL = 60
+
+
+def missing_events(flags: str) -> str:
+    """flags 中缺少的 REQUIRED_EVENTS 事件类型"""
+    # A 是 g$lshzxet 的别名
+    expanded = flags.replace('A', 'g$lshzxet')
+    return ''.join(c for c in REQUIRED_EVENTS if c not in expanded)
+
+
+class KeyspaceNotifier:
+    """
+    订阅 Redis keyspace 通知（一个连接，所有监听方共享）
+    key 被任何进程修改、删除、过期时回调 listener(key, event)
+    订阅断开时和重连成功后都会回调 reset 监听方（例如清空本地缓存、唤醒 watch 改用轮询），断开期间的事件可能漏掉
+    只有确认服务端 notify-keyspace-events 包含所需事件并订阅成功后 active 才为 True，
+    否则本地缓存保持关闭、watch 使用轮询
+    """
+
+    def __init__(self, kv, pattern: str = '*'):
+        self.kv = kv
+        self.pattern = pattern
+        self.active = False
+        self.listeners: List[Callable[[str, str], None]] = []
+        self.reset_listeners: List[Callable[[], None]] = []
+        self._task: asyncio.Task = None
+        self._warned = False
+
+    def subscribe(self, listener: Callable[[str, str], None]):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, str], None]):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def on_reset(self, listener: Callable[[], None]):
+        self.reset_listeners.append(listener)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.active = False
+
+    def _reset(self):
+        for listener in self.reset_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception('keyspace reset listener failed')
+
+    async def _enable_notifications(self, redis) -> bool:
+        """
+        在已有配置上补齐需要的事件类型，返回生效的配置是否包含 REQUIRED_EVENTS
+        托管 Redis 禁用 CONFIG 时无法确认，按未开启处理，需要提前在服务端配置
+        """
+        try:
+            current = (await redis.config_get('notify-keyspace-events')).get('notify-keyspace-events', '')
+            missing = missing_events(current)
+            if missing:
+                await redis.config_set('notify-keyspace-events', current + missing)
+                # 重新读取生效的配置，而不是假设 CONFIG SET 之后一定包含
+                current = (await redis.config_get('notify-keyspace-events')).get('notify-keyspace-events', '')
+            enabled = not missing_events(current)
+            error = f'notify-keyspace-events={current!r}'
+        except Exception as e:
+            enabled, error = False, e
+        if not enabled and not self._warned:
+            logger.warning('keyspace notifications unavailable (%s), make sure notify-keyspace-events contains %s; local cache disabled', error, REQUIRED_EVENTS)
+        self._warned = not enabled
+        return enabled
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            pubsub = None
+            try:
+                redis = self.kv.aredis
+                if not await self._enable_notifications(redis):
+                    # 收不到通知时不订阅，active 保持 False，稍后重新检查配置
+                    await asyncio.sleep(RECHECK_INTERVAL)
+                    continue
+                db = redis.connection_pool.connection_kwargs.get('db', 0)
+                prefix = f'__keyspace@{db}__:'
+                pubsub = redis.pubsub()
+                await pubsub.psubscribe(prefix + self.pattern)
+                self.active = True
+                backoff = 1
+                self._reset()
+
+                async for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    key = message['channel'][len(prefix):]
+                    event = message['data']
+                    for listener in list(self.listeners):
+                        try:
+                            listener(key, event)
+                        except Exception:
+                            logger.exception('keyspace listener failed')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('keyspace subscription lost: %s, retry in %ss', e, backoff)
+            finally:
+                was_active, self.active = self.active, False
+                if was_active:
+                    self._reset()
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
@@ -0,0 +1,95 @@
+from collections import Counter
+from typing import AsyncIterator, Optional
+
+# TTL 直方图分桶（秒），-1 为永不过期
+TTL_BUCKETS = ((60, '<1m'), (3600, '<1h'), (86400, '<1d'), (86400 * 7, '<7d'))
+
+
+def ttl_bucket(ttl: int) -> str:
+    if ttl == -1:
+        return 'no_ttl'
+    if ttl < 0:
+        return 'gone'
+    for limit, label in TTL_BUCKETS:
+        if ttl < limit:
+            return label
+    return '>=7d'
+
+
+def key_prefix(key: str, depth: int = 1) -> str:
+    return ':'.join(key.split(':')[:depth])
+
+
+class KeyspaceReport:
+    """SCAN 过程中累计的统计：按前缀计数、TTL 分布、抽样内存占用"""
+
+    def __init__(self, depth: int = 1):
+        self.depth = depth
+        self.total = 0
+        self.prefixes = Counter()
+        self.ttls = Counter()
+        self.memory_samples = Counter()
+        self.memory_bytes = Counter()
+
+    def add(self, key: str, ttl: int, memory: Optional[int] = None):
+        prefix = key_prefix(key, self.depth)
+        self.total += 1
+        self.prefixes[prefix] += 1
+        self.ttls[ttl_bucket(ttl)] += 1
+        if memory is not None:
+            self.memory_samples[prefix] += 1
+            self.memory_bytes[prefix] += memory
+
+    def summary(self) -> dict:
+        memory = {}
+        for prefix, samples in self.memory_samples.items():
+            avg = self.memory_bytes[prefix] / samples
+            # 按抽样平均值估算整个前缀的内存
+            memory[prefix] = {'samples': samples, 'avg_bytes': round(avg), 'estimated_bytes': round(avg * self.prefixes[prefix])}
+        return {
+            'total': self.total,
+            'prefixes': dict(self.prefixes.most_common()),
+            'ttl': dict(self.ttls),
+            'memory': memory,
+        }
+
+
+async def scan_keyspace(
+    redis,
+    match: str = '*',
+    count: int = 500,
+    sample_every: int = 100,
+    depth: int = 1,
+    report: Optional[KeyspaceReport] = None,
+) -> AsyncIterator[dict]:
+    """
+    用 SCAN 增量遍历 key，每批用一个 pipeline 取 TTL（和抽样的 MEMORY USAGE），逐个返回 key 信息
+    不会像 KEYS * 那样长时间阻塞 Redis；统计结果累计在 report 中
+    """
+    report = report if report is not None else KeyspaceReport(depth)
+    cursor = 0
+    while True:
+        cursor, keys = await redis.scan(cursor=cursor, match=match, count=count)
+        if keys:
+            sampled = set(keys[::sample_every]) if sample_every > 0 else set()
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.ttl(key)
+                for key in keys:
+                    if key in sampled:
+                        # 不传 samples，使用服务端默认的 5 个子元素抽样估算，避免遍历整个大集合
+                        pipe.memory_usage(key)
+                results = await pipe.execute(raise_on_error=False)
+
+            ttls = results[:len(keys)]
+            memories = iter(results[len(keys):])
+            for key, ttl in zip(keys, ttls):
+                if isinstance(ttl, Exception):
+                    ttl = -2
+                memory = next(memories) if key in sampled else None
+                if isinstance(memory, Exception):
+                    memory = None
+                report.add(key, ttl, memory)
+                yield {'key': key, 'ttl': ttl, 'memory': memory}
+        if cursor == 0:
+            break
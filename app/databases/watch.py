@@ -0,0 +1,55 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+
+class KeyWatcher:
+    """
+    把共享的 keyspace 订阅分发给等待某个 key 变化的协程（长轮询）
+    不额外占用 Redis 连接，等待方只在本进程内挂起
+    """
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self._waiters: Dict[str, Set[asyncio.Future]] = defaultdict(set)
+        notifier.subscribe(self._on_event)
+        # 订阅重连期间可能漏掉事件，唤醒所有等待方重新比对
+        notifier.on_reset(self._on_reset)
+
+    def _wake(self, key: str, event: str):
+        for fut in self._waiters.pop(key, ()):
+            if not fut.done():
+                fut.set_result(event)
+
+    def _on_event(self, key: str, event: str):
+        if key in self._waiters:
+            self._wake(key, event)
+
+    def _on_reset(self):
+        for key in list(self._waiters):
+            self._wake(key, 'reset')
+
+    def register(self, key: str) -> asyncio.Future:
+        """先登记再读当前值，避免读取和等待之间的变化被漏掉"""
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[key].add(fut)
+        return fut
+
+    def discard(self, key: str, fut: asyncio.Future):
+        waiters = self._waiters.get(key)
+        if waiters is not None:
+            waiters.discard(fut)
+            if not waiters:
+                del self._waiters[key]
+
+    async def wait(self, key: str, fut: asyncio.Future, timeout: float) -> Optional[str]:
+        """等待 key 变化，返回事件名（set/del/expired...），超时返回 None"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.discard(key, fut)
+
+    def stats(self) -> dict:
+        return {'keys': len(self._waiters), 'waiters': sum(len(w) for w in self._waiters.values())}
@@ -1,29 +1,62 @@
 import uvicorn
+import importlib.util
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
-from core.middleware import middleware
-from bot.tgb import router as bot_router
-from databases.kv import router as kv_router
-from api.mtproto import router as mtproto_router
-from api.ffmpeg import router as ffmpeg_router
+from core.middleware import TimingMiddleware
+from core.log import setup_logging, stop_logging
+from core.config import config
+from core.req import http_client
+from core.startup import import_module, log_report
+from databases.kv import kv
+from services.feeds import feeds
+
+# (模块, 前缀, tags, include_in_schema)，按顺序导入并记录耗时
+# 各模块里的重依赖（av、telethon、curl_cffi、ddddocr）都在第一次调用时才导入
+ROUTERS = [
+    ('bot.tgb', '/bot', ['tgbot'], True),
+    ('databases.kv', '', ['redis'], True),
+    ('api.mtproto', '/svc', ['tgapi'], True),
+    ('api.ffmpeg', '/svc', ['service'], True),
+    ('api.internal', '/internal', ['internal'], False),
+]
 
 def safe_register(app: FastAPI):
-    try:
-        from app.api.qwnull import router
-    except ImportError:
+    # 只检查依赖是否安装，不真正导入（ddddocr 导入时会加载 ONNX 模型）
+    if not all(importlib.util.find_spec(name) for name in ('curl_cffi', 'bs4', 'ddddocr')):
         print(f"ocr 缺少依赖")
         return
+    router = import_module('app.api.qwnull').router
     app.include_router(router, prefix="/qiwei", tags=["ocr"])
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from bot.tgb import update_queue, dispatcher, sender
+    await http_client.start()
+    await kv.start()
+    await feeds.start()
+    try:
+        yield
+    finally:
+        if update_queue:
+            await update_queue.stop()
+            await dispatcher.stop()
+            await sender.stop()
+        await feeds.stop()
+        await http_client.close()
+        await kv.close()
+        stop_logging()
+
 def create_app() -> FastAPI:
-    app = FastAPI(docs_url=None)
-    app.include_router(bot_router, prefix='/bot', tags=['tgbot'])
-    app.include_router(kv_router, tags=['redis'])
-    app.include_router(mtproto_router, prefix='/svc', tags=['tgapi'])
-    app.include_router(ffmpeg_router, prefix='/svc', tags=['service'])
+    setup_logging(config.LOG_LEVEL, access_sample_rate=config.LOG_ACCESS_SAMPLE_RATE)
+    app = FastAPI(docs_url=None, lifespan=lifespan)
+    for module, prefix, tags, in_schema in ROUTERS:
+        router = import_module(module).router
+        app.include_router(router, prefix=prefix, tags=tags, include_in_schema=in_schema)
     safe_register(app)
-    app.middleware('http')(middleware)
+    log_report()
+    app.add_middleware(TimingMiddleware)
 
     @app.get("/", include_in_schema=False)
     async def root():
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Feed:
+    name: str
+    loader: Callable[[], Awaitable[Any]]
+    interval: float
+    # 超过该时长的快照视为过期，命令到来时同步刷新一次
+    max_age: float
+    data: Any = None
+    updated_at: float = 0.0
+    error: Optional[str] = None
+    failures: int = 0
+    refreshing: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at if self.updated_at else float('inf')
+
+
+class FeedRefresher:
+    """
+    后台定时拉取上游数据并保存解析好的快照，命令处理时直接读快照，不再现场请求上游
+    loader 返回 None 表示本次拉取无效，保留旧快照
+    """
+
+    def __init__(self):
+        self.feeds: Dict[str, Feed] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._running = False
+
+    def register(self, name: str, loader: Callable[[], Awaitable[Any]], interval: float, max_age: float = None):
+        self.feeds[name] = Feed(name, loader, interval, max_age if max_age is not None else interval * 3)
+        if self._running:
+            self._spawn(self.feeds[name])
+
+    async def start(self):
+        self._running = True
+        for feed in self.feeds.values():
+            self._spawn(feed)
+
+    async def stop(self):
+        self._running = False
+        tasks = list(self._tasks.values())
+        tasks += [feed.refreshing for feed in self.feeds.values() if feed.refreshing is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _spawn(self, feed: Feed):
+        task = self._tasks.get(feed.name)
+        if task is None or task.done():
+            self._tasks[feed.name] = asyncio.create_task(self._loop(feed))
+
+    async def _loop(self, feed: Feed):
+        # 错开各个 feed 的首次请求，避免启动时同时打到同一个上游
+        await asyncio.sleep(random.uniform(0, min(feed.interval, 5)))
+        while True:
+            await self.refresh(feed.name)
+            # 连续失败时拉长间隔，最多 4 倍
+            await asyncio.sleep(feed.interval * min(2 ** feed.failures, 4))
+
+    async def refresh(self, name: str) -> Any:
+        """刷新一次，同一时刻只会有一个拉取在进行，并发调用共享结果"""
+        feed = self.feeds[name]
+        if feed.refreshing is None or feed.refreshing.done():
+            feed.refreshing = asyncio.create_task(self._refresh(feed))
+        return await asyncio.shield(feed.refreshing)
+
+    async def _refresh(self, feed: Feed) -> Any:
+        started = time.perf_counter()
+        try:
+            data = await feed.loader()
+        except Exception as e:
+            data = None
+            feed.error = repr(e)
+            logger.warning('feed %s refresh failed: %r', feed.name, e)
+        if data is None:
+            feed.failures += 1
+            return feed.data
+        feed.data, feed.updated_at, feed.error, feed.failures = data, time.time(), None, 0
+        logger.debug('feed %s refreshed in %.0fms', feed.name, (time.perf_counter() - started) * 1000)
+        return data
+
+    async def get(self, name: str) -> Any:
+        """读快照；没有快照或已过期时现场刷新一次，刷新失败则退回旧快照"""
+        feed = self.feeds[name]
+        if feed.data is None or feed.age > feed.max_age:
+            return await self.refresh(name)
+        return feed.data
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                'age': round(feed.age, 1) if feed.updated_at else None,
+                'interval': feed.interval,
+                'failures': feed.failures,
+                'error': feed.error,
+                'running': name in self._tasks and not self._tasks[name].done(),
+            }
+            for name, feed in self.feeds.items()
+        }
+
+
+feeds = FeedRefresher()
@@ -1,12 +1,18 @@
 import asyncio
 import aiohttp
 import base64
+import logging
 import math
-import sys
 import os
 
 from datetime import datetime, timezone, timedelta
 from core.config import config
+from core.req import http_client, iter_completed
+
+logger = logging.getLogger(__name__)
+
+# GitHub 对并发请求有二级限流，统一走 http_client 的 host 限流
+http_client.set_host_limit('api.github.com', max_in_flight=10, rate=10)
 
 class GIT:
     dict_save = {}
@@ -31,61 +37,60 @@ class GIT:
             return self.dict_save
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get("https://api.github.com/search/code", params=params, headers=self.headers, timeout=10) as response:
-                    if response.status == 200:
-                        json_data = await response.json()
-
-                        if q != self.dict_save.get('query'):
-                            self.dict_save = {
-                                'query': q,
-                                'days': days,
-                                'list_files': json_data.get('items'),
-                                'total_count': json_data.get('total_count'),
-                                'page_count': min(math.ceil(json_data.get('total_count') / 30), 30),
-                                'list_filtered': list(),
-                                'pages': dict(),
-                                'recorded': set()
-                            }
-                        else:
-                            self.dict_save['list_files'].extend(json_data.get('items', []))
-                        return self.dict_save
-                    else:
-                        print(f"Failed to fetch data: {response.status}")
-                        return None
+            response = await http_client.get("https://api.github.com/search/code", params=params, headers=self.headers, timeout=aiohttp.ClientTimeout(total=10))
+            if response.status_code == 200:
+                json_data = response.json()
+
+                if q != self.dict_save.get('query'):
+                    self.dict_save = {
+                        'query': q,
+                        'days': days,
+                        'list_files': json_data.get('items'),
+                        'total_count': json_data.get('total_count'),
+                        'page_count': min(math.ceil(json_data.get('total_count') / 30), 30),
+                        'list_filtered': list(),
+                        'pages': dict(),
+                        'recorded': set()
+                    }
+                else:
+                    self.dict_save['list_files'].extend(json_data.get('items', []))
+                return self.dict_save
+            else:
+                logger.warning("Failed to fetch data: %s", response.status_code)
+                return None
         except:
-            print('search_code error')
+            logger.exception('search_code error')
     
-    async def get_commit(self, session, repo_full_name, file_path, branch='main'):
-        """ 使用 aiohttp 获取文件的提交信息 """
+    async def get_commit(self, repo_full_name, file_path, branch='main'):
+        """ 获取文件的提交信息 """
         url = f"https://api.github.com/repos/{repo_full_name}/commits"
         params = {
             'path': file_path,
             'sha': branch,
         }
         try:
-            async with session.get(url, params=params, headers=self.headers, timeout=5) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data:  # 确保有提交信息
-                        return data[0]  # 返回最近一次提交的信息
-                return None
+            response = await http_client.get(url, params=params, headers=self.headers, timeout=aiohttp.ClientTimeout(total=5))
+            if response.status_code == 200:
+                data = response.json()
+                if data:  # 确保有提交信息
+                    return data[0]  # 返回最近一次提交的信息
+            return None
         except:
-            print('get_commit error')
+            logger.exception('get_commit error')
         
-    async def get_file_content(self, session, file_url):
+    async def get_file_content(self, file_url):
         """ 获取文件内容并解码 """
         try:
-            async with session.get(file_url, headers=self.headers, timeout=5) as response:
-                if response.status == 200:
-                    json_data = await response.json()
-                    content = base64.b64decode(json_data.get('content')).decode('utf-8')
-                    return content
-                else:
-                    print(f"Failed to fetch {file_url}, status code: {response.status}")
-                    return ''
+            response = await http_client.get(file_url, headers=self.headers, timeout=aiohttp.ClientTimeout(total=5))
+            if response.status_code == 200:
+                json_data = response.json()
+                content = base64.b64decode(json_data.get('content')).decode('utf-8')
+                return content
+            else:
+                logger.warning("Failed to fetch %s, status code: %s", file_url, response.status_code)
+                return ''
         except Exception as e:
-            print(f"Error fetching file content: {e}")
+            logger.warning("Error fetching file content: %s", e)
             return ''
         
     async def _check_filter_conditions(self, file):
@@ -101,7 +106,7 @@ class GIT:
             return False
         return True
 
-    async def get_contentfile_info(self, session, contentfile, page):
+    async def get_contentfile_info(self, contentfile, page):
         """ 异步获取文件详细信息并存储 """
         # 获取 repository 信息
         repo_full_name = contentfile.get("repository", {}).get("full_name", "")
@@ -109,12 +114,12 @@ class GIT:
         branch = contentfile.get("url").split('ref=')[-1]
 
         # 获取提交信息
-        commit = await self.get_commit(session, repo_full_name, file_path, branch)
+        commit = await self.get_commit(repo_full_name, file_path, branch)
         if not commit:
             await self._update_task_count(False)
             return
         
-        content = await self.get_file_content(session, contentfile.get('url'))
+        content = await self.get_file_content(contentfile.get('url'))
         
         result = {
             'path': contentfile.get('path'),
@@ -157,9 +162,10 @@ class GIT:
         self.completed_tasks = 0
         self.failed_tasks = 0
 
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.get_contentfile_info(session, file, page) for file in files]
-            await asyncio.gather(*tasks)
+        async for result in iter_completed(files, lambda file: self.get_contentfile_info(file, page), concurrency=10):
+            if not result.ok:
+                logger.warning("get_contentfile_info error: %s", result.error)
+                await self._update_task_count(False)
 
         self._wrtie_line(f'total: {self.total_tasks}, completed: {self.completed_tasks}, failed: {self.failed_tasks}, filtered: {len(self.dict_save["list_filtered"])}')
         # 返回该页的数据并缓存
@@ -214,15 +220,11 @@ class GIT:
     def _update_progress(self, current, total):
         progress = int((current / total) * 100)
         # 更新进度条
-        progress_bar = f"\r[{'=' * (progress // 2)}{' ' * (50 - progress // 2)}] {progress}%"
-        sys.stdout.write(progress_bar)
-        sys.stdout.flush()
+        progress_bar = f"[{'=' * (progress // 2)}{' ' * (50 - progress // 2)}] {progress}%"
+        logger.debug(progress_bar)
 
     def _wrtie_line(self, content):
-        # 插入新行并打印内容
-        sys.stdout.write("\033[1L")
-        sys.stdout.write(f"{content}\n")
-        sys.stdout.flush()
+        logger.info(content)
 
 git = GIT()
 
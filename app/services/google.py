@@ -1,5 +1,11 @@
+from typing import AsyncIterator
 from core.req import http_client
 from core.config import config
+import aiohttp
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Bard:
     def __init__(self):
@@ -13,18 +19,69 @@ class Bard:
         url = f'https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={self.api_key}'
         response = await http_client.post(url, headers={'Content-Type': 'application/json'}, json=contents)
         if response.status_code != 200:
-            print('request error, response:', response.json())
+            logger.warning('request error, response: %s', response.json())
 
         message = self.__parse_answer(response.json())
         if not message.get('parts'):
-            print('content:', message)
+            logger.warning('content: %s', message)
             raise ValueError('No parts found in response')
         self.__add_history(message)
         return message.get('parts')[0].get('text')
 
+    async def ask_stream(self, parts) -> AsyncIterator[str]:
+        """
+        streamGenerateContent（SSE）流式回答，逐段返回新增的文本
+        结束后把完整回答写入历史；一个字都没收到时撤回本轮提问并抛出异常
+        """
+        self.history.append({"role": "user", "parts": [{"text": parts}]})
+        contents = {'contents': self.history}
+        url = f'https://generativelanguage.googleapis.com/v1beta/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}'
+        # 流式响应可能持续很久，只限制两段数据之间的间隔
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+        texts = []
+        buffer = b''
+        try:
+            async for chunk in http_client.stream('POST', url, headers={'Content-Type': 'application/json'}, json=contents, timeout=timeout):
+                buffer += chunk.replace(b'\r\n', b'\n')
+                # SSE 事件之间以空行分隔，最后一段可能还不完整，留到下一块
+                *events, buffer = buffer.split(b'\n\n')
+                for event in events:
+                    text = self.__parse_event(event)
+                    if text:
+                        texts.append(text)
+                        yield text
+            if buffer.strip():
+                text = self.__parse_event(buffer)
+                if text:
+                    texts.append(text)
+                    yield text
+        finally:
+            if texts:
+                self.__add_history({'role': 'model', 'parts': [{'text': ''.join(texts)}]})
+            elif self.history and self.history[-1].get('role') == 'user':
+                self.history.pop()
+        if not texts:
+            raise ValueError('No parts found in response')
+
+    def __parse_event(self, event: bytes) -> str:
+        data = b''.join(line[5:].strip() for line in event.split(b'\n') if line.startswith(b'data:'))
+        if not data:
+            return ''
+        try:
+            receive = json.loads(data)
+        except ValueError:
+            logger.warning('invalid sse data: %s', data[:200])
+            return ''
+        if receive.get('error'):
+            logger.warning('stream error: %s', receive.get('error'))
+            raise ValueError(receive['error'].get('message', 'stream error'))
+        candidates = receive.get('candidates') or [{}]
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
+
     def __parse_answer(self, receive: dict) -> dict:
         if not receive.get('candidates'):
-            print('response:', receive)
+            logger.warning('response: %s', receive)
             raise ValueError('No candidates found in response')
         content: dict = receive.get('candidates')[0].get('content', {})
         history = {'role': content.get("role"), 'parts': content.get('parts', [])}
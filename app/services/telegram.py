@@ -1,7 +1,8 @@
 import asyncio
-from telethon import TelegramClient
-from telethon.sessions import StringSession
-from telethon.tl.types import PeerChannel, Message
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+    from telethon.tl.types import Message
 from core.config import config
 
 class Telegram:
@@ -13,17 +14,21 @@ class Telegram:
         self.api_id = config.TG_API_ID
         self.api_hash = config.TG_API_HASH
 
-        if not self.api_id or not self.api_hash:
-            raise RuntimeError("TG_API_ID / TG_API_HASH not set")
-
+    @property
+    def client(self) -> 'TelegramClient':
+        """第一次使用时才导入 telethon 并创建客户端，缺少配置也不影响应用启动"""
         if Telegram._client_instance is None:
+            if not self.api_id or not self.api_hash:
+                raise RuntimeError("TG_API_ID / TG_API_HASH not set")
+            from telethon import TelegramClient
+            from telethon.sessions import StringSession
             Telegram._client_instance = TelegramClient(
                 StringSession(self.str_session),
                 self.api_id,
                 self.api_hash,
                 # proxy=('SOCKS5', '192.168.3.11', 7891)
             )
-        self.client = Telegram._client_instance
+        return Telegram._client_instance
 
     async def ensure_connected(self):
         async with Telegram._lock:
@@ -31,6 +36,7 @@ class Telegram:
                 await self.client.start()
 
     async def get_channel(self, channel_id: int):
+        from telethon.tl.types import PeerChannel
         await self.ensure_connected()
         if isinstance(channel_id, str):
             channel_id = int(channel_id)
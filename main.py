@@ -5,7 +5,12 @@ import os
 
 from app.bot.local import register_handlers
 from app.bot.middleware import Middleware
+from app.bot.dispatch import ChatDispatcher
 from app.core.config import config
+from core.req import http_client  # 与 handler 共用同一个 core.req 模块实例
+from core.log import setup_logging, stop_logging
+from databases.kv import kv
+from services.feeds import feeds
 
 
 def create_app() -> AsyncTeleBot:
@@ -19,10 +24,26 @@ def create_app() -> AsyncTeleBot:
     bot.setup_middleware(Middleware(bot))
     return bot
 
+async def polling(bot: AsyncTeleBot):
+    # telebot 每批 update 都 create_task 调用 process_new_updates，换成按会话排队的分发器
+    dispatcher = ChatDispatcher.install(bot, concurrency=config.DISPATCH_CONCURRENCY, per_chat=config.DISPATCH_PER_CHAT)
+    await http_client.start()
+    await kv.start()
+    await feeds.start()
+    try:
+        await bot.polling()
+    finally:
+        await dispatcher.stop()
+        await feeds.stop()
+        await http_client.close()
+        await kv.close()
+        stop_logging()
+
 def run():
+    setup_logging(config.LOG_LEVEL)
     print('Bot is debugging...')
     bot = create_app()
-    asyncio.run(bot.polling())
+    asyncio.run(polling(bot))
 
 if __name__ == '__main__':
     run()
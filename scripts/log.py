@@ -1,10 +1,14 @@
 from pathlib import Path
 import logging
+import queue
 import shutil
 from functools import cache
 from typing import List
+import atexit
 import re
 
+from app.core.log import DroppingQueueHandler, DrainingQueueListener
+
 # 日志目录和文件路径
 LOG_DIR = Path(__file__).parent.parent / "assets"
 CURRENT_LOG = LOG_DIR / "current.log"
@@ -43,21 +47,29 @@ def setup_logging() -> logging.Logger:
         file_handler = logging.FileHandler(CURRENT_LOG, encoding="utf-8")
         file_handler.setFormatter(log_format)
         file_handler.setLevel(logging.DEBUG)  # **确保所有日志存入文件**
-        logger.addHandler(file_handler)
 
         # **控制台处理器（默认 INFO）**
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(log_format)
         console_handler.setLevel(logging.INFO)  # **默认显示 INFO 及以上的日志**
-        logger.addHandler(console_handler)
+
+        # **写文件和控制台交给后台线程，调用方只做入队**
+        log_queue = queue.Queue(maxsize=10000)
+        listener = DrainingQueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(DroppingQueueHandler(log_queue))
+        logger.listener = listener
 
     return logger
 
 def set_console_level(level: str):
     """动态调整控制台日志级别"""
     logger = logging.getLogger("flet")
-    for handler in logger.handlers:
-        if isinstance(handler, logging.StreamHandler):  # 只调整控制台的日志级别
+    listener = getattr(logger, "listener", None)
+    for handler in listener.handlers if listener else []:
+        # FileHandler 也是 StreamHandler 的子类，需要排除
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):  # 只调整控制台的日志级别
             handler.setLevel(getattr(logging, level.upper(), logging.INFO))
 
 def get_log(level: str = "INFO", max_lines: int = 100) -> List[str]:
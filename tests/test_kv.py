@@ -1,3 +1,4 @@
+import json
 import pytest
 from app.databases.kv import KV
 from urllib.request import Request, urlopen
@@ -24,4 +25,28 @@ def test_kv_get():
 
     with urlopen(req) as resp:
         assert resp.status == 200
-        print(resp.read().decode("utf-8"))
\ No newline at end of file
+        print(resp.read().decode("utf-8"))
+
+def test_kv_mset_mget():
+    items = [
+        {"key": "test:batch:a", "value": "1", "ttl": 60},
+        ["test:batch:b", "2", 60],
+    ]
+    req = Request(
+        url="http://localhost:43210/kv-mset",
+        data=json.dumps(items).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urlopen(req) as resp:
+        assert resp.status == 200
+
+    req = Request(
+        url="http://localhost:43210/kv-mget",
+        data=json.dumps({"keys": ["test:batch:a", "test:batch:b"]}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urlopen(req) as resp:
+        assert resp.status == 200
+        assert json.loads(resp.read()) == {"test:batch:a": "1", "test:batch:b": "2"}
@@ -0,0 +1,60 @@
+import asyncio
+import random
+from telebot.asyncio_helper import ApiTelegramException
+from app.bot.sender import SendScheduler, HIGH, LOW
+
+
+def make_call(sent: list, chat_id, index, fail_first: dict = None):
+    async def call():
+        await asyncio.sleep(random.uniform(0, 0.005))
+        if fail_first and fail_first.pop(index, None):
+            raise ApiTelegramException('sendMessage', None, {
+                'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                'parameters': {'retry_after': 0.05},
+            })
+        sent.append((chat_id, index))
+        return index
+    return call
+
+
+async def run_broadcast(messages_per_chat: int, chats: list, fail_first: dict = None) -> list:
+    sender = SendScheduler(rate=1000, per_chat_rate=50, workers=8)
+    sent = []
+    job = sender.broadcast([
+        (chat_id, make_call(sent, chat_id, index, fail_first))
+        for index in range(messages_per_chat) for chat_id in chats
+    ])
+    await sender.stop(timeout=10)
+    assert job.done and job.failed == 0
+    return sent
+
+
+def test_same_chat_in_order():
+    sent = asyncio.run(run_broadcast(12, [1]))
+    assert [index for _, index in sent] == list(range(12))
+
+
+def test_each_chat_in_order_when_interleaved():
+    sent = asyncio.run(run_broadcast(10, [1, 2, 3]))
+    for chat_id in (1, 2, 3):
+        assert [index for chat, index in sent if chat == chat_id] == list(range(10))
+
+
+def test_order_kept_under_429():
+    # 第 3、7 条先收到 429，重试时仍留在队首，后面的消息不能越过它们
+    sent = asyncio.run(run_broadcast(10, [1], fail_first={3: True, 7: True}))
+    assert [index for _, index in sent] == list(range(10))
+
+
+def test_high_priority_goes_first_within_chat():
+    async def main():
+        sender = SendScheduler(rate=1000, per_chat_rate=50, workers=4)
+        sent = []
+        for index in range(5):
+            sender.submit(1, make_call(sent, 1, index), LOW)
+        await sender.submit(1, make_call(sent, 1, 'urgent'), HIGH)
+        await sender.stop()
+        return [index for _, index in sent]
+    order = asyncio.run(main())
+    assert order.index('urgent') < 4
+    assert [index for index in order if index != 'urgent'] == list(range(5))